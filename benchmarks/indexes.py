@@ -0,0 +1,146 @@
+"""Compare insert throughput and day-query latency of readings index layouts.
+
+Each layout is built on a scratch copy of the readings columns, filled with
+synthetic readings for a few sensors at one-minute intervals, vacuumed, and
+then queried for single days the way api_v1_list_readings does. The scratch
+tables are dropped afterwards.
+
+    APP_SETTINGS=therminator.config.Development \\
+        python benchmarks/indexes.py --days 90 --sensors 4
+"""
+import argparse
+from datetime import datetime, timedelta
+import json
+import random
+import time
+
+from therminator import app, db
+
+CREATE_TABLE = '''
+CREATE TABLE {table} (
+    id serial,
+    sensor_id integer NOT NULL,
+    "timestamp" timestamp NOT NULL,
+    int_temp double precision NOT NULL,
+    ext_temp double precision NOT NULL,
+    humidity double precision NOT NULL,
+    resistance double precision NOT NULL
+)
+'''
+
+LAYOUTS = {
+    'before': [
+        'ALTER TABLE {table} ADD PRIMARY KEY (id)',
+        'ALTER TABLE {table} ADD UNIQUE (sensor_id, "timestamp")',
+        'CREATE INDEX ON {table} ("timestamp")',
+        'CREATE INDEX ON {table} (ext_temp)',
+    ],
+    'after': [
+        'ALTER TABLE {table} ADD PRIMARY KEY (id, "timestamp")',
+        'ALTER TABLE {table} ADD UNIQUE (sensor_id, "timestamp") '
+        'INCLUDE (int_temp, ext_temp, humidity, resistance)',
+        'CREATE INDEX ON {table} USING brin ("timestamp")',
+    ],
+}
+
+INSERT = '''
+INSERT INTO {table} (sensor_id, "timestamp", int_temp, ext_temp, humidity, resistance)
+VALUES (%s, %s, %s, %s, %s, %s)
+ON CONFLICT (sensor_id, "timestamp") DO NOTHING
+'''
+
+DAY_QUERY = '''
+EXPLAIN (ANALYZE, FORMAT JSON)
+SELECT "timestamp", int_temp, ext_temp, humidity, resistance
+FROM {table}
+WHERE sensor_id = %s AND "timestamp" BETWEEN %s AND %s
+ORDER BY "timestamp"
+'''
+
+def synthetic_rows(sensors, days, start):
+    minutes = days * 24 * 60
+    for minute in range(minutes):
+        timestamp = start + timedelta(minutes=minute)
+        for sensor_id in range(1, sensors + 1):
+            yield (
+                sensor_id,
+                timestamp,
+                random.uniform(15, 25),
+                random.uniform(-5, 35),
+                random.uniform(20, 90),
+                random.uniform(100, 5000),
+            )
+
+def node_types(plan):
+    types = {plan['Node Type']}
+    for child in plan.get('Plans', []):
+        types |= node_types(child)
+    return types
+
+def benchmark(connection, layout, rows, args, start):
+    table = 'readings_bench_{}'.format(layout)
+    cursor = connection.cursor()
+    cursor.execute('DROP TABLE IF EXISTS {}'.format(table))
+    cursor.execute(CREATE_TABLE.format(table=table))
+    for statement in LAYOUTS[layout]:
+        cursor.execute(statement.format(table=table))
+    try:
+        started = time.monotonic()
+        for i in range(0, len(rows), args.batch):
+            cursor.executemany(INSERT.format(table=table), rows[i:i + args.batch])
+        inserted = time.monotonic() - started
+        cursor.execute('VACUUM ANALYZE {}'.format(table))
+        cursor.execute(
+            'SELECT pg_size_pretty(pg_indexes_size(%s))',
+            (table,),
+        )
+        index_size = cursor.fetchone()[0]
+        latencies = []
+        nodes = set()
+        for _ in range(args.queries):
+            day = start + timedelta(days=random.randrange(args.days))
+            cursor.execute(DAY_QUERY.format(table=table), (
+                random.randint(1, args.sensors),
+                day,
+                day + timedelta(days=1),
+            ))
+            plan = cursor.fetchone()[0]
+            if isinstance(plan, str):
+                plan = json.loads(plan)
+            latencies.append(plan[0]['Execution Time'])
+            nodes |= node_types(plan[0]['Plan'])
+        latencies.sort()
+        print('{}: {:,.0f} rows/s inserted, indexes {}, day query '
+              'p50 {:.3f}ms p95 {:.3f}ms via {}'.format(
+                  layout,
+                  len(rows) / inserted,
+                  index_size,
+                  latencies[len(latencies) // 2],
+                  latencies[int(len(latencies) * 0.95)],
+                  ', '.join(sorted(nodes)),
+              ))
+    finally:
+        cursor.execute('DROP TABLE IF EXISTS {}'.format(table))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--days', type=int, default=30)
+    parser.add_argument('--sensors', type=int, default=4)
+    parser.add_argument('--batch', type=int, default=1000)
+    parser.add_argument('--queries', type=int, default=200)
+    args = parser.parse_args()
+
+    start = datetime(2017, 1, 1)
+    rows = list(synthetic_rows(args.sensors, args.days, start))
+    print('{:,} readings, {} sensors, {} days'.format(len(rows), args.sensors, args.days))
+    with app.app_context():
+        connection = db.engine.raw_connection()
+        connection.set_isolation_level(0)
+        try:
+            for layout in sorted(LAYOUTS, reverse=True):
+                benchmark(connection, layout, rows, args, start)
+        finally:
+            connection.close()
+
+if __name__ == '__main__':
+    main()
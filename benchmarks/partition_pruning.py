@@ -0,0 +1,88 @@
+"""Show which readings partitions the day queries touch.
+
+Runs EXPLAIN ANALYZE on the queries behind show_sensor and
+api_v1_list_readings for one sensor and local date, and reports the
+partitions each plan scans out of all partitions that exist.
+
+    APP_SETTINGS=therminator.config.Production \\
+        python benchmarks/partition_pruning.py SENSOR_UUID 2017-05-30
+"""
+import argparse
+import json
+import pytz
+from sqlalchemy.dialects import postgresql
+
+from therminator import app, db
+from therminator.dates import day_bounds, parse_date
+from therminator.models import Reading, Sensor
+
+PARTITIONS = '''
+SELECT child.relname
+FROM pg_inherits
+JOIN pg_class parent ON parent.oid = pg_inherits.inhparent
+JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+WHERE parent.relname = 'readings'
+ORDER BY child.relname
+'''
+
+def scanned_relations(plan):
+    relations = set()
+    if 'Relation Name' in plan:
+        relations.add(plan['Relation Name'])
+    for child in plan.get('Plans', []):
+        relations |= scanned_relations(child)
+    return relations
+
+def explain(query, runs):
+    sql = str(query.statement.compile(
+        dialect=postgresql.dialect(),
+        compile_kwargs={'literal_binds': True},
+    ))
+    timings = []
+    for _ in range(runs):
+        result = db.session.execute('EXPLAIN (ANALYZE, FORMAT JSON) ' + sql).scalar()
+        if isinstance(result, str):
+            result = json.loads(result)
+        timings.append((result[0]['Planning Time'], result[0]['Execution Time']))
+    timings.sort(key=lambda t: t[1])
+    planning, execution = timings[len(timings) // 2]
+    return scanned_relations(result[0]['Plan']), planning, execution
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('sensor', help='UUID of the sensor to query')
+    parser.add_argument('date', type=parse_date, help='local date (YYYY-MM-DD)')
+    parser.add_argument('--runs', type=int, default=11)
+    args = parser.parse_args()
+
+    with app.app_context():
+        sensor = Sensor.query.filter_by(uuid=args.sensor).one()
+        lower, upper = day_bounds(args.date, pytz.timezone(sensor.home.timezone))
+        day = Reading.timestamp.between(lower, upper)
+        queries = [
+            ('show_sensor rows', sensor.readings.filter(day).order_by(Reading.timestamp)),
+            ('api_v1_list_readings count/max', db.session.query(
+                db.func.count(),
+                db.func.max(Reading.timestamp),
+            ).filter(Reading.sensor_id == sensor.id).filter(day)),
+            ('api_v1_list_readings rows', db.session.query(Reading.timestamp, Reading.ext_temp)
+                .filter(Reading.sensor_id == sensor.id).filter(day)
+                .order_by(Reading.timestamp)),
+        ]
+        partitions = [row[0] for row in db.session.execute(PARTITIONS)]
+        print('{} partitions of readings'.format(len(partitions)))
+        for name, query in queries:
+            relations, planning, execution = explain(query, args.runs)
+            scanned = sorted(r for r in relations if r in partitions)
+            print('{}: scanned {} of {} partitions ({}); '
+                  'median planning {:.3f}ms, execution {:.3f}ms'.format(
+                      name,
+                      len(scanned),
+                      len(partitions),
+                      ', '.join(scanned) or 'none',
+                      planning,
+                      execution,
+                  ))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,6 @@
+import os
+from prometheus_client import multiprocess
+
+def child_exit(server, worker):
+    if os.getenv('prometheus_multiproc_dir'):
+        multiprocess.mark_process_dead(worker.pid)
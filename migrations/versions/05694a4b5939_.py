@@ -0,0 +1,36 @@
+"""Rework readings indexes for append-only day scans
+
+Revision ID: 05694a4b5939
+Revises: 4488eefaf8f8
+Create Date: 2026-10-18 14:40:12.660385
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '05694a4b5939'
+down_revision = '4488eefaf8f8'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.drop_index(op.f('ix_readings_ext_temp'), table_name='readings')
+    op.drop_index(op.f('ix_readings_timestamp'), table_name='readings')
+    op.drop_constraint('sensor_id_timestamp_unq', 'readings', type_='unique')
+    op.execute(
+        'ALTER TABLE readings ADD CONSTRAINT sensor_id_timestamp_unq '
+        'UNIQUE (sensor_id, "timestamp") '
+        'INCLUDE (int_temp, ext_temp, humidity, resistance)'
+    )
+    op.create_index('ix_readings_timestamp_brin', 'readings', ['timestamp'], unique=False, postgresql_using='brin')
+
+
+def downgrade():
+    op.drop_index('ix_readings_timestamp_brin', table_name='readings')
+    op.drop_constraint('sensor_id_timestamp_unq', 'readings', type_='unique')
+    op.create_unique_constraint('sensor_id_timestamp_unq', 'readings', ['sensor_id', 'timestamp'])
+    op.create_index(op.f('ix_readings_timestamp'), 'readings', ['timestamp'], unique=False)
+    op.create_index(op.f('ix_readings_ext_temp'), 'readings', ['ext_temp'], unique=False)
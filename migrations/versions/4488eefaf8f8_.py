@@ -0,0 +1,94 @@
+"""Partition readings by month
+
+Revision ID: 4488eefaf8f8
+Revises: 237f84f5c889
+Create Date: 2026-10-18 13:22:51.904417
+
+"""
+from alembic import op
+from datetime import date
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4488eefaf8f8'
+down_revision = '237f84f5c889'
+branch_labels = None
+depends_on = None
+
+MONTHS_AHEAD = 3
+
+COLUMNS = 'id, sensor_id, "timestamp", int_temp, ext_temp, humidity, resistance'
+
+CREATE_READINGS = '''
+CREATE TABLE readings (
+    id integer NOT NULL DEFAULT nextval('readings_id_seq'),
+    sensor_id integer NOT NULL REFERENCES sensors (id),
+    "timestamp" timestamp without time zone NOT NULL,
+    int_temp double precision NOT NULL DEFAULT 0.0,
+    ext_temp double precision NOT NULL,
+    humidity double precision NOT NULL DEFAULT 0.0,
+    resistance double precision NOT NULL DEFAULT 0.0,
+    CONSTRAINT readings_pkey PRIMARY KEY ({primary_key}),
+    CONSTRAINT sensor_id_timestamp_unq UNIQUE (sensor_id, "timestamp"),
+    CONSTRAINT humidity_between_0_and_100 CHECK (humidity >= 0 AND humidity <= 100),
+    CONSTRAINT resistance_must_be_positive CHECK (resistance >= 0)
+){partition_by}
+'''
+
+
+def next_month(month):
+    if month.month == 12:
+        return date(month.year + 1, 1, 1)
+    return date(month.year, month.month + 1, 1)
+
+
+def rename_readings(suffix):
+    op.rename_table('readings', 'readings_' + suffix)
+    op.execute('ALTER TABLE readings_{0} RENAME CONSTRAINT readings_pkey TO readings_{0}_pkey'.format(suffix))
+    op.execute('ALTER TABLE readings_{0} RENAME CONSTRAINT sensor_id_timestamp_unq TO readings_{0}_sensor_id_timestamp_unq'.format(suffix))
+    op.execute('ALTER INDEX ix_readings_timestamp RENAME TO ix_readings_{}_timestamp'.format(suffix))
+    op.execute('ALTER INDEX ix_readings_ext_temp RENAME TO ix_readings_{}_ext_temp'.format(suffix))
+
+
+def copy_readings(suffix):
+    op.execute('INSERT INTO readings ({0}) SELECT {0} FROM readings_{1}'.format(COLUMNS, suffix))
+    op.execute('ALTER SEQUENCE readings_id_seq OWNED BY readings.id')
+    op.drop_table('readings_' + suffix)
+    op.create_index(op.f('ix_readings_ext_temp'), 'readings', ['ext_temp'], unique=False)
+    op.create_index(op.f('ix_readings_timestamp'), 'readings', ['timestamp'], unique=False)
+
+
+def upgrade():
+    op.drop_constraint('sensors_latest_reading_id_fkey', 'sensors', type_='foreignkey')
+    rename_readings('unpartitioned')
+    op.execute(CREATE_READINGS.format(
+        primary_key='id, "timestamp"',
+        partition_by=' PARTITION BY RANGE ("timestamp")',
+    ))
+
+    first, last = op.get_bind().execute(
+        'SELECT min("timestamp"), max("timestamp") FROM readings_unpartitioned'
+    ).fetchone()
+    today = date.today()
+    month = date((first or today).year, (first or today).month, 1)
+    end = date(today.year, today.month, 1)
+    for _ in range(MONTHS_AHEAD):
+        end = next_month(end)
+    if last and last.date() > end:
+        end = last.date()
+    while month <= end:
+        op.execute(
+            "CREATE TABLE readings_y{0:%Y}m{0:%m} PARTITION OF readings "
+            "FOR VALUES FROM ('{0}') TO ('{1}')".format(month, next_month(month))
+        )
+        month = next_month(month)
+
+    copy_readings('unpartitioned')
+
+
+def downgrade():
+    rename_readings('partitioned')
+    op.execute(CREATE_READINGS.format(primary_key='id', partition_by=''))
+    copy_readings('partitioned')
+    op.create_foreign_key('sensors_latest_reading_id_fkey', 'sensors', 'readings', ['latest_reading_id'], ['id'], ondelete='SET NULL')
@@ -0,0 +1,31 @@
+"""Track when each rollup bucket was last written
+
+Revision ID: c1f0a9d27e34
+Revises: 05694a4b5939
+Create Date: 2026-10-18 18:05:41.218530
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c1f0a9d27e34'
+down_revision = '05694a4b5939'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    for table in ('hourly_rollups', 'daily_rollups'):
+        op.add_column(table, sa.Column(
+            'updated_at',
+            sa.DateTime(),
+            server_default=sa.text("timezone('UTC', clock_timestamp())"),
+            nullable=False,
+        ))
+
+
+def downgrade():
+    for table in ('hourly_rollups', 'daily_rollups'):
+        op.drop_column(table, 'updated_at')
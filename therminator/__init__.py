@@ -31,4 +31,5 @@ login_manager.session_protection = 'basic'
 
 sslify = SSLify(app, permanent=True)
 
-import therminator.views, therminator.api.views
+import therminator.logs, therminator.views, therminator.api.views, therminator.commands
+import therminator.profiling
@@ -0,0 +1,114 @@
+from datetime import datetime
+import numpy as np
+
+from . import db
+from .models import MEASUREMENTS, Reading
+
+PERCENTILES = (5, 25, 50, 75, 95)
+
+# Magnus coefficients (Alduchov & Eskridge) for dew point over water.
+MAGNUS_A = 17.625
+MAGNUS_B = 243.04
+
+def load_readings(sensor_id, lower, upper):
+    epoch = db.cast(db.func.extract('epoch', Reading.timestamp), db.Float)
+    rows = db.session.query(epoch, *[getattr(Reading, name) for name in MEASUREMENTS]) \
+        .filter(Reading.sensor_id == sensor_id) \
+        .filter(Reading.timestamp.between(lower, upper)) \
+        .order_by(Reading.timestamp).all()
+    data = np.array(rows, dtype=np.float64).reshape(-1, len(MEASUREMENTS) + 1)
+    arrays = dict(timestamp=data[:, 0])
+    for i, name in enumerate(MEASUREMENTS, 1):
+        arrays[name] = data[:, i]
+    return arrays
+
+def fahrenheit(celsius):
+    return celsius * 9 / 5 + 32
+
+def celsius(fahrenheit):
+    return (fahrenheit - 32) * 5 / 9
+
+def luminosity(resistance):
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(resistance > 0, 1e6 / resistance, np.nan)
+
+def dew_point(temp, humidity):
+    with np.errstate(divide='ignore', invalid='ignore'):
+        gamma = np.log(humidity / 100) + MAGNUS_A * temp / (MAGNUS_B + temp)
+        return np.where(humidity > 0, MAGNUS_B * gamma / (MAGNUS_A - gamma), np.nan)
+
+def heat_index(temp, humidity):
+    # NWS Rothfusz regression with its low and high humidity adjustments,
+    # falling back to Steadman's simple formula below 80F.
+    t = fahrenheit(temp)
+    rh = humidity
+    simple = 0.5 * (t + 61 + (t - 68) * 1.2 + rh * 0.094)
+    full = (
+        -42.379 + 2.04901523 * t + 10.14333127 * rh
+        - 0.22475541 * t * rh - 6.83783e-3 * t ** 2
+        - 5.481717e-2 * rh ** 2 + 1.22874e-3 * t ** 2 * rh
+        + 8.5282e-4 * t * rh ** 2 - 1.99e-6 * t ** 2 * rh ** 2
+    )
+    with np.errstate(invalid='ignore'):
+        dry = (rh < 13) & (t >= 80) & (t <= 112)
+        full = np.where(
+            dry,
+            full - (13 - rh) / 4 * np.sqrt(np.clip(17 - np.abs(t - 95), 0, None) / 17),
+            full,
+        )
+        humid = (rh > 85) & (t >= 80) & (t <= 87)
+        full = np.where(humid, full + (rh - 85) / 10 * (87 - t) / 5, full)
+    return celsius(np.where((simple + t) / 2 >= 80, full, simple))
+
+def degree_days(timestamps, temp, base):
+    if len(timestamps) < 2:
+        return 0.0, 0.0
+    days = (timestamps - timestamps[0]) / 86400
+    heating = np.trapz(np.clip(base - temp, 0, None), days)
+    cooling = np.trapz(np.clip(temp - base, 0, None), days)
+    return float(heating), float(cooling)
+
+def summarize(timestamps, values, percentiles=PERCENTILES):
+    valid = ~np.isnan(values)
+    if not valid.any():
+        return dict(count=0)
+    timestamps, values = timestamps[valid], values[valid]
+    low, high = np.argmin(values), np.argmax(values)
+    return dict(
+        count=int(values.size),
+        min=dict(value=float(values[low]), timestamp=from_epoch(timestamps[low])),
+        max=dict(value=float(values[high]), timestamp=from_epoch(timestamps[high])),
+        mean=float(values.mean()),
+        percentiles={
+            'p{}'.format(p): float(v)
+            for p, v in zip(percentiles, np.percentile(values, percentiles))
+        },
+    )
+
+def derived_series(arrays):
+    return dict(
+        int_temp_f=fahrenheit(arrays['int_temp']),
+        ext_temp_f=fahrenheit(arrays['ext_temp']),
+        dew_point=dew_point(arrays['ext_temp'], arrays['humidity']),
+        heat_index=heat_index(arrays['ext_temp'], arrays['humidity']),
+        luminosity=luminosity(arrays['resistance']),
+    )
+
+def analyze(arrays, base):
+    series = dict(arrays, **derived_series(arrays))
+    timestamps = series.pop('timestamp')
+    heating, cooling = degree_days(timestamps, arrays['ext_temp'], base)
+    return dict(
+        count=int(timestamps.size),
+        stats={
+            name: summarize(timestamps, values)
+            for name, values in sorted(series.items())
+        },
+        degree_days=dict(base=base, heating=heating, cooling=cooling),
+    ), timestamps, series
+
+def as_list(values):
+    return [None if np.isnan(v) else round(v, 3) for v in values.tolist()]
+
+def from_epoch(seconds):
+    return datetime.utcfromtimestamp(float(seconds))
@@ -0,0 +1,146 @@
+from collections import namedtuple
+import dateutil.parser
+from flask import json
+import os
+import shutil
+import tempfile
+import threading
+
+from .. import app, db
+from ..cache import LRUCache
+from ..rollups import TOUCHED_DAYS
+
+CachedPayload = namedtuple('CachedPayload', 'etag last_modified mimetype body')
+
+
+class ResponseCache:
+    # Payloads are keyed by (sensor_id, local date, format, fields) and
+    # carry the ETag they were built for. With a directory configured,
+    # entries are also written to disk so gunicorn workers share them; a
+    # memory entry is only served while the file it was read from or
+    # written to is still in place.
+    def __init__(self, maxsize, directory=None):
+        self.directory = directory
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self._memory = LRUCache(maxsize, weigher=lambda entry: len(entry[1].body))
+        self._lock = threading.Lock()
+
+    def get(self, key, etag=None):
+        entry = self._memory.get(key)
+        if self.directory:
+            path = self._path(key)
+            version = self._version(path)
+            if entry is None or entry[0] != version:
+                entry = self._read(path, version)
+                if entry:
+                    self._memory.set(key, entry)
+                else:
+                    self._memory.discard(key)
+        # Invalidation only reaches the worker that committed the write, so
+        # callers pass the day's current ETag and older payloads are refused.
+        if entry is not None and etag is not None and entry[1].etag != etag:
+            entry = None
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return entry[1]
+
+    def set(self, key, payload, generation=None):
+        # Skip payloads built from a query that raced an invalidation.
+        if generation is not None and generation != self.generation:
+            return
+        version = None
+        if self.directory:
+            version = self._write(self._path(key), payload)
+        self._memory.set(key, (version, payload))
+
+    def invalidate(self, sensor_id, day):
+        self._memory.discard_where(lambda key, entry: key[:2] == (sensor_id, day))
+        if self.directory:
+            shutil.rmtree(
+                os.path.join(self.directory, str(sensor_id), day.isoformat()),
+                ignore_errors=True,
+            )
+        with self._lock:
+            self.invalidations += 1
+
+    def clear(self):
+        self._memory.clear()
+        if self.directory:
+            for name in os.listdir(self.directory):
+                shutil.rmtree(os.path.join(self.directory, name), ignore_errors=True)
+
+    @property
+    def generation(self):
+        return self.invalidations
+
+    def stats(self):
+        stats = self._memory.stats()
+        stats.update(
+            hits=self.hits,
+            misses=self.misses,
+            invalidations=self.invalidations,
+        )
+        return stats
+
+    def _path(self, key):
+        sensor_id, day, fmt, fields = key
+        return os.path.join(
+            self.directory,
+            str(sensor_id),
+            day.isoformat(),
+            '{}-{}'.format(fmt, '-'.join(fields)),
+        )
+
+    def _version(self, path):
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        return (stat.st_ino, stat.st_mtime_ns)
+
+    def _read(self, path, version):
+        if version is None:
+            return None
+        try:
+            with open(path, 'rb') as f:
+                meta = json.loads(f.readline().decode())
+                body = f.read()
+            if meta['last_modified']:
+                meta['last_modified'] = dateutil.parser.parse(meta['last_modified'])
+        except (OSError, ValueError, KeyError):
+            return None
+        return (version, CachedPayload(body=body, **meta))
+
+    def _write(self, path, payload):
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=directory)
+        with os.fdopen(fd, 'wb') as f:
+            f.write(json.dumps(dict(
+                etag=payload.etag,
+                last_modified=payload.last_modified and payload.last_modified.isoformat(),
+                mimetype=payload.mimetype,
+            )).encode() + b'\n')
+            f.write(payload.body)
+        os.replace(tmp, path)
+        return self._version(path)
+
+
+response_cache = ResponseCache(
+    app.config['RESPONSE_CACHE_SIZE'],
+    directory=app.config['RESPONSE_CACHE_DIR'],
+)
+
+@db.event.listens_for(db.session, 'after_commit')
+def invalidate_touched_days(session):
+    for sensor_id, day in session.info.pop(TOUCHED_DAYS, ()):
+        response_cache.invalidate(sensor_id, day)
+
+@db.event.listens_for(db.session, 'after_rollback')
+def forget_touched_days(session):
+    session.info.pop(TOUCHED_DAYS, None)
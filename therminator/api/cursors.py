@@ -0,0 +1,25 @@
+from datetime import timedelta
+from itsdangerous import BadSignature, URLSafeSerializer
+
+from .. import app
+from ..exc import ApiError
+from .formats import EPOCH
+
+MICROSECOND = timedelta(microseconds=1)
+
+# Cursors are signed so clients treat them as opaque and cannot hand one
+# issued for one sensor to another.
+def serializer():
+    return URLSafeSerializer(app.config['SECRET_KEY'], salt='readings-cursor')
+
+def encode_cursor(sensor_id, timestamp):
+    return serializer().dumps([sensor_id, (timestamp - EPOCH) // MICROSECOND])
+
+def decode_cursor(token, sensor_id):
+    try:
+        cursor_sensor_id, offset = serializer().loads(token)
+    except (BadSignature, TypeError, ValueError) as e:
+        raise ApiError('cursor is not valid.') from e
+    if cursor_sensor_id != sensor_id:
+        raise ApiError('cursor belongs to another sensor.')
+    return EPOCH + offset * MICROSECOND
@@ -0,0 +1,90 @@
+from array import array
+from datetime import datetime
+from flask import Response, json, jsonify
+import struct
+import sys
+
+from ..models import MEASUREMENTS, Reading
+
+TIMESTAMP_FORMAT = '%Y-%m-%dT%H:%MZ'
+
+EPOCH = datetime(1970, 1, 1)
+
+FORMATS = {
+    'json': 'application/json',
+    'columnar': 'application/vnd.therminator.columnar+json',
+    'binary': 'application/vnd.therminator.readings',
+}
+
+# magic, version, field count, padding, row count, base epoch seconds.
+# The header is followed by one field code per series (indexes into
+# MEASUREMENTS, padded to four bytes), int32 second offsets from the base
+# epoch and then one float32 array per series, all little-endian.
+BINARY_HEADER = struct.Struct('<4sBBHIq')
+BINARY_MAGIC = b'THRM'
+BINARY_VERSION = 1
+
+def columns(fields=MEASUREMENTS):
+    return [Reading.timestamp] + [getattr(Reading, name) for name in fields]
+
+def epoch_seconds(timestamp):
+    return int((timestamp - EPOCH).total_seconds())
+
+def reading_dict(row, fields=MEASUREMENTS):
+    values = dict(timestamp=row.timestamp.strftime(TIMESTAMP_FORMAT))
+    for name in fields:
+        values[name] = getattr(row, name)
+    return values
+
+def iter_json_array(rows, fields=MEASUREMENTS, chunk_size=500):
+    yield '['
+    separator = ''
+    chunk = []
+    for row in rows:
+        chunk.append(json.dumps(reading_dict(row, fields)))
+        if len(chunk) >= chunk_size:
+            yield separator + ','.join(chunk)
+            separator = ','
+            chunk = []
+    if chunk:
+        yield separator + ','.join(chunk)
+    yield ']'
+
+def columnar(rows, fields=MEASUREMENTS):
+    epoch = epoch_seconds(rows[0].timestamp) if rows else 0
+    data = dict(
+        epoch=epoch,
+        fields=list(fields),
+        timestamp=[epoch_seconds(row.timestamp) - epoch for row in rows],
+    )
+    for i, name in enumerate(fields, 1):
+        data[name] = [row[i] for row in rows]
+    return data
+
+def packed(rows, fields=MEASUREMENTS):
+    epoch = epoch_seconds(rows[0].timestamp) if rows else 0
+    offsets = array('i', (epoch_seconds(row.timestamp) - epoch for row in rows))
+    series = [array('f', (row[i] for row in rows)) for i in range(1, len(fields) + 1)]
+    if sys.byteorder == 'big':
+        for values in [offsets] + series:
+            values.byteswap()
+    header = BINARY_HEADER.pack(
+        BINARY_MAGIC,
+        BINARY_VERSION,
+        len(fields),
+        0,
+        len(rows),
+        epoch,
+    )
+    codes = bytes(MEASUREMENTS.index(name) for name in fields)
+    codes += bytes(-len(codes) % 4)
+    return b''.join(
+        [header, codes, offsets.tobytes()] + [values.tobytes() for values in series]
+    )
+
+def render_readings(rows, fmt='json', fields=MEASUREMENTS):
+    if fmt == 'columnar':
+        return Response(json.dumps(columnar(rows, fields)), mimetype=FORMATS[fmt])
+    elif fmt == 'binary':
+        return Response(packed(rows, fields), mimetype=FORMATS[fmt])
+    return jsonify([reading_dict(row, fields) for row in rows])
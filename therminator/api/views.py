@@ -1,23 +1,174 @@
-from datetime import datetime, time, timedelta
-from flask import jsonify, request
-from flask_login import current_user, login_required
+from collections import Counter, namedtuple
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+import dateutil.parser
+from flask import (
+    Response,
+    abort,
+    jsonify,
+    request,
+    stream_with_context,
+    url_for,
+)
+from flask_login import UserMixin, current_user, login_required
+from functools import wraps
+import hashlib
+import hmac
 from http import HTTPStatus
+from psycopg2.errorcodes import FOREIGN_KEY_VIOLATION
 import pytz
-import re
+from sqlalchemy import event
 from sqlalchemy.exc import IntegrityError
 
-from .. import app, db, login_manager
+from .. import analytics, app, db, login_manager
+from ..cache import LRUCache
+from ..dates import day_bounds, parse_date
+from ..downsample import lttb
 from ..exc import ApiError
-from ..models import User, Home, Sensor, Reading
+from ..ingest import (
+    CONFLICT_POLICIES,
+    MEASUREMENTS,
+    ingest_buffer,
+    ingest_readings,
+    ingest_stream,
+    validate_reading,
+    write_readings,
+)
+from ..logs import auth_summary, ingest_summary
+from ..metrics import count_auth, count_readings
+from ..models import (
+    User,
+    Home,
+    Sensor,
+    Reading,
+    HourlyRollup,
+    DailyRollup,
+)
+from ..profiling import query_stats
+from .cache import CachedPayload, response_cache
+from .cursors import decode_cursor, encode_cursor
+from .formats import (
+    FORMATS,
+    TIMESTAMP_FORMAT,
+    columnar,
+    columns,
+    epoch_seconds,
+    iter_json_array,
+    reading_dict,
+    render_readings,
+)
+
+api_key_cache = LRUCache(
+    app.config['API_KEY_CACHE_SIZE'],
+    ttl=app.config['API_KEY_CACHE_TTL'],
+)
+
+sensor_cache = LRUCache(
+    app.config['SENSOR_CACHE_SIZE'],
+    ttl=app.config['SENSOR_CACHE_TTL'],
+)
+
+SensorRef = namedtuple('SensorRef', 'id home_id timezone')
+
+
+class ApiUser(UserMixin):
+    def __init__(self, id, name, email):
+        self.id = id
+        self.name = name
+        self.email = email
+
+    def __repr__(self):
+        return '<ApiUser id={} email={}>'.format(self.id, self.email)
+
+    @property
+    def homes(self):
+        return Home.query.filter_by(user_id=self.id).order_by(Home.name)
+
+
+@event.listens_for(User, 'after_update')
+@event.listens_for(User, 'after_delete')
+def expire_api_user(mapper, connection, user):
+    api_key_cache.discard_where(lambda digest, identity: identity.id == user.id)
+
+@event.listens_for(Sensor, 'after_update')
+@event.listens_for(Sensor, 'after_delete')
+def expire_sensor_ref(mapper, connection, sensor):
+    sensor_cache.discard_where(lambda key, ref: ref.id == sensor.id)
+
+@event.listens_for(Home, 'after_update')
+@event.listens_for(Home, 'after_delete')
+def expire_home_sensor_refs(mapper, connection, home):
+    sensor_cache.discard_where(lambda key, ref: ref.home_id == home.id)
+
+def resolve_sensor(sensor_uuid, user_id):
+    key = (sensor_uuid, user_id)
+    ref = sensor_cache.get(key)
+    if ref is None:
+        row = db.session.query(Sensor.id, Sensor.home_id, Home.timezone) \
+            .select_from(Sensor).filter(Sensor.uuid == sensor_uuid) \
+            .join(Home).filter(Home.user_id == user_id).first()
+        if row is None:
+            abort(HTTPStatus.NOT_FOUND)
+        ref = SensorRef(*row)
+        sensor_cache.set(key, ref)
+    return ref
+
+def ops_token_required(f):
+    # Operational endpoints expose process-wide state across every account,
+    # so they answer only to OPS_TOKEN and are closed when it is unset.
+    @wraps(f)
+    def wrapper(*args, **kwargs):
+        token = app.config['OPS_TOKEN']
+        supplied = request.headers.get('Authorization', '')
+        if not token or not hmac.compare_digest(supplied, 'Bearer ' + token):
+            raise ApiError(
+                'Please include the operations token in the Authorization header.',
+                status_code=HTTPStatus.UNAUTHORIZED,
+            )
+        return f(*args, **kwargs)
+    return wrapper
+
+@contextmanager
+def writing_to_sensor(sensor_uuid, user_id):
+    # Another worker may have deleted the sensor since it was cached here.
+    try:
+        yield
+    except IntegrityError as e:
+        if getattr(e.orig, 'pgcode', None) != FOREIGN_KEY_VIOLATION:
+            raise
+        db.session.rollback()
+        sensor_cache.discard((sensor_uuid, user_id))
+        abort(HTTPStatus.NOT_FOUND)
 
 @login_manager.request_loader
 def load_user_from_request(request):
+    # API keys only authenticate the API. The HTML views expect a full User
+    # signed in through the session, so they never see an ApiUser.
+    if not request.path.startswith('/api/'):
+        return None
     api_key = request.headers.get('Authorization')
     if api_key:
-        user = User.query.filter_by(api_key=api_key).first()
-        if user:
-            app.logger.info('User {!r} authenticated with API'.format(user.email))
-            return user
+        # The cache is per process and only the writing worker expires it,
+        # so a rotated key stays usable elsewhere for up to the TTL. Set
+        # API_KEY_CACHE_TTL to 0 to look the key up on every request.
+        caching = app.config['API_KEY_CACHE_TTL'] > 0
+        digest = hashlib.sha256(api_key.encode()).hexdigest()
+        identity = api_key_cache.get(digest) if caching else None
+        if identity is None:
+            user = User.query.filter_by(api_key=api_key).first()
+            if user:
+                identity = ApiUser(user.id, user.name, user.email)
+                if caching:
+                    api_key_cache.set(digest, identity)
+        if identity:
+            count_auth('api_key', 'success')
+            auth_summary.count('success')
+            return identity
+        count_auth('api_key', 'failure')
+        auth_summary.count('failure')
+    else:
+        count_auth('api_key', 'missing')
+        auth_summary.count('missing')
     if wants_json():
         raise ApiError(
             'Please include a valid API key in the Authorization header.',
@@ -28,41 +179,450 @@ def load_user_from_request(request):
 @app.route('/api/v1/<uuid:sensor_uuid>/readings/<date:date>')
 @login_required
 def api_v1_list_readings(sensor_uuid, date):
-    sensor = db.session.query(Sensor).filter_by(uuid=sensor_uuid) \
-        .join(Home).filter_by(user_id=current_user.id).first_or_404()
-    timezone = pytz.timezone(sensor.home.timezone)
-    midnight = timezone.localize(datetime.combine(date, time())) \
-        .astimezone(pytz.utc).replace(tzinfo=None)
-    readings = sensor.readings.filter(Reading.timestamp.between(
-        midnight,
-        midnight + timedelta(days=1)
-    )).order_by(Reading.timestamp)
-    return jsonify([r.as_dict() for r in readings])
+    sensor = resolve_sensor(sensor_uuid, current_user.id)
+    fmt = format_arg()
+    fields = fields_arg()
+    timezone = pytz.timezone(sensor.timezone)
+    lower, upper = day_bounds(date, timezone)
+    key = (sensor.id, date, fmt, fields)
+    generation = response_cache.generation
+    # Every write to the day, overwrites included, bumps its rollup.
+    count, modified = db.session.query(
+        DailyRollup.count,
+        DailyRollup.updated_at,
+    ).filter_by(sensor_id=sensor.id, day=date).first() or (0, None)
+    etag = hashlib.sha1('{}:{}:{}:{}:{}:{}:{}'.format(
+        sensor.id,
+        date,
+        sensor.timezone,
+        count,
+        modified,
+        fmt,
+        ','.join(fields),
+    ).encode()).hexdigest()
+    if is_not_modified(etag, modified):
+        response = Response(status=HTTPStatus.NOT_MODIFIED)
+        return cache_day(response, etag, modified, upper)
+    cached = response_cache.get(key, etag)
+    if cached:
+        response = Response(cached.body, mimetype=cached.mimetype)
+        return cache_day(response, etag, modified, upper)
+    rows = db.session.query(*columns(fields)) \
+        .filter(Reading.sensor_id == sensor.id) \
+        .filter(Reading.timestamp.between(lower, upper)) \
+        .order_by(Reading.timestamp)
+    if fmt == 'json' and bool_arg('stream', app.config['API_STREAM_READINGS']):
+        chunk_size = app.config['API_STREAM_CHUNK_SIZE']
+        rows = rows.execution_options(stream_results=True).yield_per(chunk_size)
+        response = Response(
+            stream_with_context(iter_json_array(rows, fields, chunk_size)),
+            mimetype='application/json',
+        )
+    else:
+        response = render_readings(rows.all(), fmt, fields)
+        response_cache.set(key, CachedPayload(
+            etag=etag,
+            last_modified=modified,
+            mimetype=response.mimetype,
+            body=response.get_data(),
+        ), generation)
+    return cache_day(response, etag, modified, upper)
+
+@app.route('/api/v1/<uuid:sensor_uuid>/readings/range')
+@login_required
+def api_v1_list_readings_range(sensor_uuid):
+    sensor = resolve_sensor(sensor_uuid, current_user.id)
+    start, end = date_range_args()
+    fields = fields_arg()
+    max_points = request.args.get(
+        'max_points',
+        app.config['API_RANGE_DEFAULT_POINTS'],
+        type=int,
+    )
+    max_points = min(max(max_points, 3), app.config['API_RANGE_MAX_POINTS'])
+    timezone = pytz.timezone(sensor.timezone)
+    lower, _ = day_bounds(start, timezone)
+    _, upper = day_bounds(end, timezone)
+    # M4 reduction in the database: from each bucket keep only the first,
+    # last, lowest and highest rows, so spikes reach LTTB intact and only
+    # a few rows per bucket leave the database whatever the raw row count.
+    buckets = max_points * app.config['API_RANGE_BUCKETS_PER_POINT']
+    width = (upper - lower).total_seconds() / buckets
+    bucket = db.func.floor(
+        (db.func.extract('epoch', Reading.timestamp) - epoch_seconds(lower)) / width
+    )
+    def rank(*order_by):
+        return db.func.row_number().over(partition_by=bucket, order_by=order_by)
+    ranks = [
+        rank(Reading.timestamp).label('first_rank'),
+        rank(Reading.timestamp.desc()).label('last_rank'),
+    ]
+    for name in fields:
+        column = getattr(Reading, name)
+        ranks += [
+            rank(column.asc().nullslast(), Reading.timestamp)
+                .label('{}_min_rank'.format(name)),
+            rank(column.desc().nullslast(), Reading.timestamp)
+                .label('{}_max_rank'.format(name)),
+        ]
+    ranked = db.session.query(
+        Reading.timestamp.label('timestamp'),
+        db.func.count().over().label('total'),
+        *[getattr(Reading, name).label(name) for name in fields] + ranks
+    ).filter(Reading.sensor_id == sensor.id) \
+        .filter(Reading.timestamp.between(lower, upper)) \
+        .subquery()
+    def kept(name):
+        return [
+            'first_rank',
+            'last_rank',
+            '{}_min_rank'.format(name),
+            '{}_max_rank'.format(name),
+        ]
+    labels = sorted(set(sum((kept(name) for name in fields), [])))
+    rows = db.session.query(ranked) \
+        .filter(db.or_(*[ranked.c[label] == 1 for label in labels])) \
+        .order_by(ranked.c.timestamp).all()
+    series = {}
+    for name in fields:
+        points = [
+            (epoch_seconds(row.timestamp), getattr(row, name), row.timestamp)
+            for row in rows
+            if getattr(row, name) is not None
+            and any(getattr(row, label) == 1 for label in kept(name))
+        ]
+        series[name] = [
+            [timestamp.strftime(TIMESTAMP_FORMAT), value]
+            for _, value, timestamp in lttb(points, max_points)
+        ]
+    return jsonify(
+        start=start.isoformat(),
+        end=end.isoformat(),
+        count=rows[0].total if rows else 0,
+        series=series,
+    )
+
+@app.route('/api/v1/<uuid:sensor_uuid>/readings')
+@login_required
+def api_v1_page_readings(sensor_uuid):
+    sensor = resolve_sensor(sensor_uuid, current_user.id)
+    fields = fields_arg()
+    limit = request.args.get('limit', app.config['API_PAGE_SIZE'], type=int)
+    limit = min(max(limit, 1), app.config['API_PAGE_MAX_SIZE'])
+    rows = db.session.query(*columns(fields)) \
+        .filter(Reading.sensor_id == sensor.id)
+    cursor = request.args.get('cursor')
+    if cursor:
+        rows = rows.filter(Reading.timestamp > decode_cursor(cursor, sensor.id))
+    rows = rows.order_by(Reading.timestamp).limit(limit + 1).all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(sensor.id, rows[-1].timestamp)
+    response = jsonify(
+        readings=[reading_dict(row, fields) for row in rows],
+        next_cursor=next_cursor,
+    )
+    if next_cursor:
+        next_url = url_for(
+            'api_v1_page_readings',
+            sensor_uuid=sensor_uuid,
+            cursor=next_cursor,
+            limit=limit,
+            fields=request.args.get('fields'),
+            _external=True,
+        )
+        response.headers['Link'] = '<{}>; rel="next"'.format(next_url)
+    return response
+
+@app.route('/api/v1/<uuid:sensor_uuid>/readings/delta')
+@login_required
+def api_v1_readings_delta(sensor_uuid):
+    sensor = resolve_sensor(sensor_uuid, current_user.id)
+    fmt = format_arg()
+    if fmt == 'binary':
+        raise ApiError('Deltas are available as json or columnar.')
+    fields = fields_arg()
+    cursor = request.args.get('cursor')
+    if cursor:
+        since = decode_cursor(cursor, sensor.id)
+    else:
+        since = timestamp_arg('since')
+    limit = app.config['API_PAGE_MAX_SIZE']
+    rows = db.session.query(*columns(fields)) \
+        .filter(Reading.sensor_id == sensor.id) \
+        .filter(Reading.timestamp > since) \
+        .order_by(Reading.timestamp).limit(limit + 1).all()
+    # Nothing new is the common case for a polling chart, so answer it
+    # without a body and let the client keep its cursor.
+    if not rows:
+        return Response(status=HTTPStatus.NO_CONTENT)
+    more = len(rows) > limit
+    rows = rows[:limit]
+    if fmt == 'columnar':
+        data = columnar(rows, fields)
+    else:
+        data = dict(readings=[reading_dict(row, fields) for row in rows])
+    data.update(cursor=encode_cursor(sensor.id, rows[-1].timestamp), more=more)
+    response = jsonify(data)
+    response.mimetype = FORMATS[fmt]
+    return response
+
+@app.route('/api/v1/<uuid:sensor_uuid>/analytics')
+@login_required
+def api_v1_analytics(sensor_uuid):
+    sensor = resolve_sensor(sensor_uuid, current_user.id)
+    start, end = date_range_args()
+    base = request.args.get('base', app.config['DEGREE_DAY_BASE'], type=float)
+    timezone = pytz.timezone(sensor.timezone)
+    lower, _ = day_bounds(start, timezone)
+    _, upper = day_bounds(end, timezone)
+    arrays = analytics.load_readings(sensor.id, lower, upper)
+    result, timestamps, series = analytics.analyze(arrays, base)
+    for stats in result['stats'].values():
+        for key in 'min', 'max':
+            if key in stats:
+                stats[key]['timestamp'] = \
+                    stats[key]['timestamp'].strftime(TIMESTAMP_FORMAT)
+    result.update(start=start.isoformat(), end=end.isoformat())
+    if bool_arg('series'):
+        epoch = int(timestamps[0]) if timestamps.size else 0
+        result['series'] = dict(
+            epoch=epoch,
+            timestamp=(timestamps - epoch).astype(int).tolist(),
+            **{name: analytics.as_list(values) for name, values in series.items()}
+        )
+    return jsonify(result)
 
 @app.route('/api/v1/<uuid:sensor_uuid>/readings', methods=['POST'])
 @login_required
 def api_v1_create_reading(sensor_uuid):
-    sensor = db.session.query(Sensor).filter_by(uuid=sensor_uuid) \
-        .join(Home).filter_by(user_id=current_user.id).first_or_404()
+    sensor = resolve_sensor(sensor_uuid, current_user.id)
+    policy = conflict_policy()
+    if request.mimetype == 'application/x-ndjson':
+        with writing_to_sensor(sensor_uuid, current_user.id):
+            summary, errors = ingest_stream(
+                sensor.id,
+                request.stream,
+                policy,
+                chunk_size=app.config['API_STREAM_CHUNK_SIZE'],
+                max_errors=app.config['API_STREAM_MAX_ERRORS'],
+            )
+        count_summary(summary, policy)
+        return jsonify(
+            created=summary['created'],
+            updated=summary['updated'],
+            duplicate=summary['duplicate'],
+            invalid=summary['invalid'],
+            errors=errors,
+        )
     data = request.get_json()
     try:
-        reading = Reading(sensor=sensor, **data)
-        db.session.add(reading)
+        row = validate_reading(data)
+    except ValueError as e:
+        app.logger.warning('Failed to create reading: {}'.format(e.args[0]))
+        count_summary(Counter(['invalid']), policy)
+        raise ApiError(
+            e.args[0],
+            status_code=HTTPStatus.UNPROCESSABLE_ENTITY,
+        ) from e
+    row['sensor_id'] = sensor.id
+    if app.config['INGEST_WRITE_BEHIND'] and ingest_buffer.put(row):
+        count_summary(Counter(['accepted']), policy)
+        return jsonify({'status': 'Accepted'}), HTTPStatus.ACCEPTED
+    with writing_to_sensor(sensor_uuid, current_user.id):
+        written = write_readings([row], policy)
         db.session.commit()
-        app.logger.info('Created reading with {}'.format(data))
+    status = written.get((sensor.id, row['timestamp']))
+    count_summary(Counter([status or 'duplicate']), policy)
+    if status == 'created':
         return jsonify({'status': 'Created'}), HTTPStatus.CREATED
-    except (IntegrityError, ValueError) as e:
-        if re.search(r'Key \(.*\) already exists', e.args[0]):
-            message = 'A conflicting record already exists.'
-            status_code = HTTPStatus.CONFLICT
-        else:
-            message = e.args[0]
-            status_code = HTTPStatus.UNPROCESSABLE_ENTITY
-        app.logger.warning('Failed to create reading: {}'.format(e.args[0]))
-        raise ApiError(message, status_code=status_code) from e
+    elif status == 'updated':
+        return jsonify({'status': 'Updated'}), HTTPStatus.OK
+    elif policy == 'reject':
+        app.logger.warning('Failed to create reading: duplicate {}'.format(data))
+        raise ApiError(
+            'A conflicting record already exists.',
+            status_code=HTTPStatus.CONFLICT,
+        )
+    return jsonify({'status': 'Duplicate'}), HTTPStatus.OK
+
+@app.route('/api/v1/<uuid:sensor_uuid>/readings/batch', methods=['POST'])
+@login_required
+def api_v1_create_readings(sensor_uuid):
+    sensor = resolve_sensor(sensor_uuid, current_user.id)
+    data = request.get_json()
+    if not isinstance(data, list):
+        raise ApiError('Please submit readings as a JSON array.')
+    limit = app.config['API_BATCH_SIZE']
+    if len(data) > limit:
+        raise ApiError(
+            'A batch may contain at most {} readings.'.format(limit),
+            status_code=HTTPStatus.REQUEST_ENTITY_TOO_LARGE,
+        )
+    policy = conflict_policy()
+    with writing_to_sensor(sensor_uuid, current_user.id):
+        results = ingest_readings(sensor.id, enumerate(data), policy)
+        db.session.commit()
+    summary = Counter(result['status'] for result in results)
+    count_summary(summary, policy)
+    return jsonify(
+        created=summary['created'],
+        updated=summary['updated'],
+        duplicate=summary['duplicate'],
+        invalid=summary['invalid'],
+        results=results,
+    )
+
+@app.route('/api/v1/ingest')
+@ops_token_required
+def api_v1_ingest_status():
+    return jsonify(
+        write_behind=bool(app.config['INGEST_WRITE_BEHIND']),
+        queue_depth=ingest_buffer.depth,
+        dropped=ingest_buffer.dropped,
+    )
+
+@app.route('/api/v1/cache')
+@ops_token_required
+def api_v1_cache_status():
+    return jsonify(
+        api_keys=api_key_cache.stats(),
+        sensors=sensor_cache.stats(),
+        responses=response_cache.stats(),
+    )
+
+@app.route('/api/v1/queries')
+@ops_token_required
+def api_v1_query_stats():
+    return jsonify(query_stats())
+
+@app.route('/api/v1/<uuid:sensor_uuid>/rollups/hourly')
+@login_required
+def api_v1_list_hourly_rollups(sensor_uuid):
+    sensor = resolve_sensor(sensor_uuid, current_user.id)
+    start, end = date_range_args(app.config['API_ROLLUP_MAX_DAYS'])
+    timezone = pytz.timezone(sensor.timezone)
+    lower, _ = day_bounds(start, timezone)
+    _, upper = day_bounds(end, timezone)
+    rollups = HourlyRollup.query.filter_by(sensor_id=sensor.id) \
+        .filter(HourlyRollup.hour >= lower, HourlyRollup.hour < upper) \
+        .order_by(HourlyRollup.hour)
+    return jsonify([r.as_dict() for r in rollups])
+
+@app.route('/api/v1/<uuid:sensor_uuid>/rollups/daily')
+@login_required
+def api_v1_list_daily_rollups(sensor_uuid):
+    sensor = resolve_sensor(sensor_uuid, current_user.id)
+    start, end = date_range_args(app.config['API_ROLLUP_MAX_DAYS'])
+    rollups = DailyRollup.query.filter_by(sensor_id=sensor.id) \
+        .filter(DailyRollup.day.between(start, end)) \
+        .order_by(DailyRollup.day)
+    return jsonify([r.as_dict() for r in rollups])
 
 
+def is_not_modified(etag, last_modified):
+    if request.if_none_match:
+        return request.if_none_match.contains(etag)
+    if request.if_modified_since and last_modified:
+        return last_modified.replace(microsecond=0) <= request.if_modified_since
+    return False
+
+def cache_day(response, etag, last_modified, day_end):
+    response.set_etag(etag)
+    if last_modified:
+        response.last_modified = last_modified
+    now = datetime.utcnow()
+    reach = app.config['READING_MAX_AGE']
+    response.cache_control.private = True
+    if reach is not None and day_end + timedelta(seconds=reach) <= now:
+        # Ingest rejects readings this old, so the day can no longer change.
+        response.cache_control.max_age = app.config['API_CLOSED_DAY_MAX_AGE']
+    elif day_end <= now:
+        # Late uploads can still backfill a past day; revalidate every time
+        # and let the rollup ETag answer 304 while nothing has changed.
+        response.cache_control.no_cache = True
+    else:
+        response.cache_control.max_age = app.config['API_OPEN_DAY_MAX_AGE']
+    response.vary.update(['Accept', 'Authorization'])
+    return response
+
+def bool_arg(name, default=False):
+    value = request.args.get(name)
+    if value is None:
+        return bool(default)
+    return value.lower() in ('1', 'true', 'yes')
+
+def format_arg():
+    fmt = request.args.get('format')
+    if fmt is None:
+        best = request.accept_mimetypes.best_match(list(FORMATS.values()))
+        fmt = next((k for k, v in FORMATS.items() if v == best), 'json')
+    if fmt not in FORMATS:
+        raise ApiError('format must be one of {}.'.format(', '.join(FORMATS)))
+    return fmt
+
+def fields_arg():
+    value = request.args.get('fields')
+    if not value:
+        return MEASUREMENTS
+    fields = tuple(value.split(','))
+    unknown = [name for name in fields if name not in MEASUREMENTS]
+    if unknown:
+        raise ApiError('{} is not a reading field.'.format(unknown[0]))
+    return fields
+
+def date_arg(name, default=None):
+    value = request.args.get(name)
+    if value is None and default is not None:
+        return default
+    try:
+        return parse_date(value)
+    except (TypeError, ValueError) as e:
+        raise ApiError('{} must be a date in YYYY-MM-DD format.'.format(name)) from e
+
+def timestamp_arg(name):
+    value = request.args.get(name)
+    if value is None:
+        raise ApiError('{} is required.'.format(name))
+    try:
+        value = dateutil.parser.parse(value)
+    except (OverflowError, ValueError) as e:
+        raise ApiError('{} must be an ISO 8601 date and time.'.format(name)) from e
+    if value.tzinfo:
+        value = value.astimezone(pytz.utc).replace(tzinfo=None)
+    return value
+
+def date_range_args(max_days=None):
+    start = date_arg('start')
+    end = date_arg('end', start)
+    if end < start:
+        raise ApiError('end must not be before start.')
+    max_days = max_days or app.config['API_RANGE_MAX_DAYS']
+    if (end - start).days >= max_days:
+        raise ApiError('A range may span at most {} days.'.format(max_days))
+    return start, end
+
+def count_summary(summary, policy):
+    for status, amount in summary.items():
+        if status == 'duplicate' and policy == 'reject':
+            status = 'conflict'
+        count_readings(status, amount)
+        ingest_summary.count(status, amount)
+
+def conflict_policy():
+    policy = request.args.get(
+        'on_conflict',
+        app.config['READING_CONFLICT_POLICY'],
+    )
+    if policy not in CONFLICT_POLICIES:
+        raise ApiError(
+            'on_conflict must be one of {}.'.format(', '.join(CONFLICT_POLICIES)),
+        )
+    return policy
+
 def wants_json():
-    types = request.accept_mimetypes
-    best = types.best_match(['application/json', 'text/html'])
-    return best == 'application/json' or types[best] > types['text/html']
+    best = request.accept_mimetypes.best_match(
+        list(FORMATS.values()) + ['text/html'],
+    )
+    return best in FORMATS.values()
@@ -0,0 +1,79 @@
+from collections import OrderedDict
+import threading
+import time
+
+class LRUCache:
+    def __init__(self, maxsize, ttl=None, weigher=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.weigher = weigher
+        self.weight = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key, default=None):
+        with self._lock:
+            try:
+                expires, weight, value = self._data[key]
+            except KeyError:
+                self.misses += 1
+                return default
+            if expires is not None and expires < time.monotonic():
+                self._remove(key)
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value):
+        expires = time.monotonic() + self.ttl if self.ttl else None
+        weight = self.weigher(value) if self.weigher else 1
+        with self._lock:
+            if key in self._data:
+                self._remove(key)
+            self._data[key] = (expires, weight, value)
+            self.weight += weight
+            while self.weight > self.maxsize and self._data:
+                self._remove(next(iter(self._data)))
+                self.evictions += 1
+
+    def discard(self, key):
+        with self._lock:
+            if key in self._data:
+                self._remove(key)
+
+    def discard_where(self, predicate):
+        with self._lock:
+            stale = [
+                key for key, (_, _, value) in self._data.items()
+                if predicate(key, value)
+            ]
+            for key in stale:
+                self._remove(key)
+            return len(stale)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.weight = 0
+
+    def _remove(self, key):
+        _, weight, _ = self._data.pop(key)
+        self.weight -= weight
+
+    def stats(self):
+        return dict(
+            size=len(self._data),
+            weight=self.weight,
+            maxsize=self.maxsize,
+            hits=self.hits,
+            misses=self.misses,
+            evictions=self.evictions,
+        )
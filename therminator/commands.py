@@ -0,0 +1,187 @@
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import timedelta
+import click
+import csv
+import json
+import os
+import pytz
+import tempfile
+import time
+
+from . import app, db
+from .api.cache import response_cache
+from .dates import day_bounds, parse_date
+from .ingest import FIELDS, MEASUREMENTS, validate_reading
+from .models import Sensor
+from .partitions import create_upcoming_partitions, prepare_partitions
+from .rollups import (
+    rebuild_rollups,
+    refresh_latest_readings,
+    refresh_rollups,
+)
+
+COLUMNS = ', '.join('"{}"'.format(key) for key in FIELDS)
+
+CREATE_STAGING_TABLE = '''
+CREATE TEMP TABLE readings_import (
+    "timestamp" timestamp NOT NULL,
+    int_temp float NOT NULL,
+    ext_temp float NOT NULL,
+    humidity float NOT NULL,
+    resistance float NOT NULL
+) ON COMMIT DROP
+'''
+
+COPY_READINGS = 'COPY readings_import ({}) FROM STDIN WITH (FORMAT csv)' \
+    .format(COLUMNS)
+
+MERGE_READINGS = '''
+INSERT INTO readings (sensor_id, {columns})
+SELECT DISTINCT ON ("timestamp") %(sensor_id)s, {columns}
+FROM readings_import
+ORDER BY "timestamp"
+ON CONFLICT ON CONSTRAINT sensor_id_timestamp_unq {action}
+'''
+
+def read_records(source, fmt):
+    if fmt == 'csv':
+        for lineno, record in enumerate(csv.DictReader(source), 2):
+            yield lineno, {k: v if v != '' else None for k, v in record.items()}
+    else:
+        for lineno, line in enumerate(source, 1):
+            if line.strip():
+                yield lineno, line
+
+def parse_file(path, fmt):
+    count = 0
+    rejects = []
+    fd, copy_path = tempfile.mkstemp(suffix='.csv')
+    with open(path, newline='') as source, \
+            os.fdopen(fd, 'w', newline='') as out:
+        writer = csv.writer(out)
+        for lineno, record in read_records(source, fmt):
+            try:
+                if fmt == 'ndjson':
+                    record = json.loads(record)
+                row = validate_reading(record, check_window=False)
+            except (TypeError, ValueError) as e:
+                rejects.append((lineno, str(e)))
+                continue
+            writer.writerow([row[key] for key in FIELDS])
+            count += 1
+    return copy_path, count, rejects
+
+@app.cli.command('import-readings')
+@click.option('--sensor', 'sensor_uuid', required=True,
+              help='UUID of the sensor the readings belong to.')
+@click.option('--format', 'fmt', type=click.Choice(['csv', 'ndjson']),
+              help='Input format. Guessed from the file extension by default.')
+@click.option('--on-conflict', type=click.Choice(['ignore', 'overwrite']),
+              default='ignore', show_default=True)
+@click.option('--workers', type=int, default=os.cpu_count(), show_default=True)
+@click.argument('paths', nargs=-1, required=True,
+                type=click.Path(exists=True, dir_okay=False))
+def import_readings(sensor_uuid, fmt, on_conflict, workers, paths):
+    """Bulk load CSV or NDJSON files of readings with COPY."""
+    sensor = Sensor.query.filter_by(uuid=sensor_uuid).first()
+    if not sensor:
+        raise click.BadParameter('no sensor with UUID {}'.format(sensor_uuid))
+    if on_conflict == 'overwrite':
+        action = 'DO UPDATE SET ' + ', '.join(
+            '{0} = excluded.{0}'.format(key) for key in MEASUREMENTS
+        )
+    else:
+        action = 'DO NOTHING'
+    merge = MERGE_READINGS.format(columns=COLUMNS, action=action)
+
+    started = time.monotonic()
+    parsed = rejected = 0
+    with db.engine.begin() as connection:
+        cursor = connection.connection.cursor()
+        cursor.execute(CREATE_STAGING_TABLE)
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = {
+                executor.submit(parse_file, path, fmt or guess_format(path)): path
+                for path in paths
+            }
+            for future in as_completed(futures):
+                path = futures[future]
+                copy_path, count, rejects = future.result()
+                try:
+                    with open(copy_path) as copy_file:
+                        cursor.copy_expert(COPY_READINGS, copy_file)
+                finally:
+                    os.remove(copy_path)
+                parsed += count
+                rejected += len(rejects)
+                for lineno, error in rejects:
+                    click.echo('{}:{}: {}'.format(path, lineno, error), err=True)
+                click.echo('{}: {} rows, {} rejected'.format(path, count, len(rejects)))
+        cursor.execute('SELECT min("timestamp"), max("timestamp") FROM readings_import')
+        start, end = cursor.fetchone()
+        if start:
+            prepare_partitions(connection, start, end)
+        cursor.execute(merge, {'sensor_id': sensor.id})
+        merged = cursor.rowcount
+        days = refresh_rollups(connection, sensor.id, start, end) if start else []
+        refresh_latest_readings(connection, [sensor.id])
+    for sensor_id, day in days:
+        response_cache.invalidate(sensor_id, day)
+
+    elapsed = time.monotonic() - started
+    click.echo(
+        'Imported {} of {} rows ({} rejected, {} conflicting) '
+        'in {:.1f}s ({:,.0f} rows/s)'.format(
+            merged,
+            parsed,
+            rejected,
+            parsed - merged,
+            elapsed,
+            parsed / elapsed if elapsed else 0,
+        )
+    )
+
+@app.cli.command('rebuild-rollups')
+@click.option('--sensor', 'sensor_uuid',
+              help='UUID of a single sensor to rebuild. Defaults to all.')
+@click.option('--start', required=True, help='First local date (YYYY-MM-DD).')
+@click.option('--end', required=True, help='Last local date (YYYY-MM-DD).')
+def rebuild_rollups_command(sensor_uuid, start, end):
+    """Recompute hourly and daily rollups over a range of dates."""
+    try:
+        start, end = parse_date(start), parse_date(end)
+    except ValueError as e:
+        raise click.BadParameter('dates must be in YYYY-MM-DD format') from e
+    sensors = Sensor.query
+    if sensor_uuid:
+        sensors = sensors.filter_by(uuid=sensor_uuid)
+    invalidated = []
+    with db.engine.begin() as connection:
+        for sensor in sensors:
+            timezone = pytz.timezone(sensor.home.timezone)
+            lower, _ = day_bounds(start, timezone)
+            _, upper = day_bounds(end, timezone)
+            days = rebuild_rollups(
+                connection,
+                sensor.id,
+                lower,
+                upper - timedelta(microseconds=1),
+            )
+            click.echo('{}: {} days'.format(sensor.name, len(days)))
+            invalidated += days
+    for sensor_id, day in invalidated:
+        response_cache.invalidate(sensor_id, day)
+
+@app.cli.command('create-partitions')
+@click.option('--months', type=int, default=app.config['READING_PARTITIONS_AHEAD'],
+              show_default=True, help='Number of months ahead to create.')
+def create_partitions(months):
+    """Create monthly readings partitions for this and upcoming months."""
+    with db.engine.begin() as connection:
+        for name in create_upcoming_partitions(connection, months):
+            click.echo(name)
+
+def guess_format(path):
+    if path.endswith(('.ndjson', '.jsonl', '.json')):
+        return 'ndjson'
+    return 'csv'
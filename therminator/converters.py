@@ -1,12 +1,12 @@
-from datetime import datetime
 import re
 import uuid
 from werkzeug.routing import BaseConverter, ValidationError
+from .dates import parse_date
 
 class DateConverter(BaseConverter):
     def to_python(self, value):
         try:
-            return datetime.strptime(value, '%Y-%m-%d').date()
+            return parse_date(value)
         except ValueError as e:
             raise ValidationError from e
 
@@ -0,0 +1,36 @@
+from datetime import datetime, time, timedelta
+from functools import lru_cache
+import pytz
+
+@lru_cache(maxsize=None)
+def get_timezone(name):
+    return pytz.timezone(name)
+
+def localize(timestamp, timezone):
+    return pytz.utc.localize(timestamp, is_dst=None).astimezone(timezone)
+
+def utc_midnight(date, timezone):
+    return timezone.localize(datetime.combine(date, time())) \
+        .astimezone(pytz.utc).replace(tzinfo=None)
+
+def day_bounds(date, timezone):
+    return (
+        utc_midnight(date, timezone),
+        utc_midnight(date + timedelta(days=1), timezone),
+    )
+
+def parse_date(value):
+    return datetime.strptime(value, '%Y-%m-%d').date()
+
+def format_local_times(timestamps, timezone, fmt):
+    # Readings are ordered, so when the first and last share a UTC offset
+    # nothing in between crossed a DST change and one offset fits them all.
+    if not timestamps:
+        return []
+    first = localize(timestamps[0], timezone)
+    last = localize(timestamps[-1], timezone)
+    if first.utcoffset() != last.utcoffset():
+        return [localize(t, timezone).strftime(fmt) for t in timestamps]
+    offset = first.utcoffset()
+    fmt = fmt.replace('%Z', first.strftime('%Z'))
+    return [(t + offset).strftime(fmt) for t in timestamps]
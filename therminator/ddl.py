@@ -0,0 +1,25 @@
+from sqlalchemy import UniqueConstraint
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.schema import CreateTable
+
+# SQLAlchemy 1.1 has no dialect options for declarative partitioning or
+# covering indexes, so tables and unique constraints carry them in info.
+
+@compiles(CreateTable, 'postgresql')
+def create_partitioned_table(element, compiler, **kw):
+    sql = compiler.visit_create_table(element)
+    partition_by = element.element.info.get('partition_by')
+    if partition_by:
+        sql = '{} PARTITION BY {}\n\n'.format(sql.rstrip(), partition_by)
+    return sql
+
+@compiles(UniqueConstraint, 'postgresql')
+def create_covering_unique_constraint(element, compiler, **kw):
+    sql = compiler.visit_unique_constraint(element)
+    include = element.info.get('include')
+    if include:
+        sql = '{} INCLUDE ({})'.format(
+            sql,
+            ', '.join(compiler.preparer.quote(name) for name in include),
+        )
+    return sql
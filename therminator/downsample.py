@@ -0,0 +1,30 @@
+def lttb(points, threshold):
+    # Largest-Triangle-Three-Buckets: keep the first and last points and,
+    # from each bucket in between, the point forming the largest triangle
+    # with the previously kept point and the average of the next bucket.
+    # Points are (x, y, ...) tuples sorted by x; extra members are kept.
+    n = len(points)
+    if threshold >= n or threshold < 3:
+        return list(points)
+    sampled = [points[0]]
+    every = (n - 2) / (threshold - 2)
+    a = 0
+    for i in range(threshold - 2):
+        avg_start = int((i + 1) * every) + 1
+        avg_end = min(int((i + 2) * every) + 1, n)
+        avg_x = sum(p[0] for p in points[avg_start:avg_end]) / (avg_end - avg_start)
+        avg_y = sum(p[1] for p in points[avg_start:avg_end]) / (avg_end - avg_start)
+        ax, ay = points[a][0], points[a][1]
+        max_area = -1
+        for j in range(int(i * every) + 1, int((i + 1) * every) + 1):
+            area = abs(
+                (ax - avg_x) * (points[j][1] - ay)
+                - (ax - points[j][0]) * (avg_y - ay)
+            )
+            if area > max_area:
+                max_area = area
+                chosen = j
+        sampled.append(points[chosen])
+        a = chosen
+    sampled.append(points[-1])
+    return sampled
@@ -12,6 +12,11 @@ class ApiError(Exception):
         return dict(error=self.message)
 
 
+class PartitionUnavailable(ApiError):
+    def __init__(self, message):
+        super().__init__(message, status_code=HTTPStatus.SERVICE_UNAVAILABLE)
+
+
 @app.errorhandler(ApiError)
 def handle_api_error(error):
     response = jsonify(error.as_dict())
@@ -0,0 +1,257 @@
+import atexit
+from collections import Counter
+from datetime import datetime, timedelta
+from itertools import islice
+import json
+import os
+import queue
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.exc import DataError, IntegrityError
+import threading
+import time
+
+from . import app, db
+from .metrics import count_dropped
+from .models import FIELDS, MEASUREMENTS, Reading
+from .partitions import prepare_partitions
+from .rollups import (
+    record_touched_days,
+    refresh_latest_readings,
+    refresh_written_rollups,
+)
+
+CONFLICT_POLICIES = ('ignore', 'overwrite', 'reject')
+
+def validate_reading(data, check_window=True):
+    if not isinstance(data, dict):
+        raise ValueError('reading must be a JSON object')
+    unknown = sorted(set(data) - set(FIELDS))
+    if unknown:
+        raise ValueError('{} is not a reading attribute'.format(unknown[0]))
+    reading = Reading(sensor=None, **data)
+    row = {key: getattr(reading, key) for key in FIELDS}
+    if check_window:
+        validate_timestamp_window(row['timestamp'])
+    if row['int_temp'] is None:
+        row['int_temp'] = 0.0
+    return row
+
+def validate_timestamp_window(timestamp):
+    # Bounds the months a device clock can make us partition for.
+    now = datetime.utcnow()
+    skew = app.config['READING_MAX_SKEW']
+    if timestamp > now + timedelta(seconds=skew):
+        raise ValueError('timestamp must not be in the future')
+    max_age = app.config['READING_MAX_AGE']
+    if max_age is not None and timestamp < now - timedelta(seconds=max_age):
+        raise ValueError(
+            'timestamp must be within the last {} days'.format(max_age // 86400)
+        )
+
+def write_readings(rows, policy='ignore'):
+    if not rows:
+        return {}
+    timestamps = [row['timestamp'] for row in rows]
+    prepare_partitions(db.session, min(timestamps), max(timestamps))
+    table = Reading.__table__
+    stmt = insert(table).values(rows)
+    if policy == 'overwrite':
+        stmt = stmt.on_conflict_do_update(
+            constraint='sensor_id_timestamp_unq',
+            set_={key: stmt.excluded[key] for key in MEASUREMENTS},
+        )
+    else:
+        stmt = stmt.on_conflict_do_nothing(constraint='sensor_id_timestamp_unq')
+    # xmax is only non-zero on rows that ON CONFLICT DO UPDATE rewrote.
+    stmt = stmt.returning(
+        table.c.sensor_id,
+        table.c.timestamp,
+        db.literal_column('xmax = 0', type_=db.Boolean),
+    )
+    written = {
+        (sensor_id, timestamp): 'created' if inserted else 'updated'
+        for sensor_id, timestamp, inserted in db.session.execute(stmt)
+    }
+    days = refresh_written_rollups(db.session, written)
+    record_touched_days(db.session, days)
+    if written:
+        refresh_latest_readings(db.session, {key[0] for key in written})
+    return written
+
+def ingest_readings(sensor_id, items, policy='ignore'):
+    results = {}
+    pending = {}
+    for index, data in items:
+        try:
+            row = validate_reading(data)
+        except ValueError as e:
+            results[index] = dict(index=index, status='invalid', error=e.args[0])
+            continue
+        if row['timestamp'] in pending:
+            results[index] = dict(index=index, status='duplicate')
+            continue
+        row['sensor_id'] = sensor_id
+        pending[row['timestamp']] = (index, row)
+    written = write_readings([row for _, row in pending.values()], policy)
+    for timestamp, (index, row) in pending.items():
+        status = written.get((sensor_id, timestamp), 'duplicate')
+        results[index] = dict(index=index, status=status)
+    return [results[index] for index in sorted(results)]
+
+def ingest_stream(sensor_id, lines, policy='ignore', chunk_size=500, max_errors=100):
+    summary = Counter()
+    errors = []
+    numbered = enumerate(lines, 1)
+    while True:
+        chunk = list(islice(numbered, chunk_size))
+        if not chunk:
+            break
+        items = []
+        results = []
+        for lineno, line in chunk:
+            if not line.strip():
+                continue
+            try:
+                items.append((lineno, json.loads(line)))
+            except ValueError:
+                results.append(dict(
+                    index=lineno,
+                    status='invalid',
+                    error='line is not valid JSON',
+                ))
+        results.extend(ingest_readings(sensor_id, items, policy))
+        db.session.commit()
+        for result in results:
+            summary[result['status']] += 1
+            if result['status'] == 'invalid' and len(errors) < max_errors:
+                errors.append(dict(line=result['index'], error=result['error']))
+    return summary, errors
+
+
+class WriteBehindBuffer:
+    # Best effort: rows are acknowledged before they are written, so a batch
+    # that still fails after its retries, or a queue lost to a restart, is
+    # gone. Dropped rows are logged and counted.
+    def __init__(self, app):
+        self.app = app
+        self.dropped = 0
+        self._lock = threading.Lock()
+        self._pid = None
+        self._queue = None
+        self._stopping = None
+        self._thread = None
+
+    @property
+    def depth(self):
+        if self._queue is None or self._pid != os.getpid():
+            return 0
+        return self._queue.qsize()
+
+    def put(self, row):
+        self._start()
+        try:
+            self._queue.put_nowait(row)
+        except queue.Full:
+            return False
+        return True
+
+    def stop(self):
+        if self._thread is None or self._pid != os.getpid():
+            return
+        self._stopping.set()
+        self._thread.join()
+        self._thread = None
+
+    def _start(self):
+        with self._lock:
+            if self._pid != os.getpid():
+                # Threads do not survive gunicorn's fork, so each worker
+                # starts its own flusher the first time it buffers a row.
+                self._pid = os.getpid()
+                self._queue = queue.Queue(self.app.config['INGEST_QUEUE_SIZE'])
+                self._thread = None
+                atexit.register(self.stop)
+            if self._thread is None or not self._thread.is_alive():
+                self._stopping = threading.Event()
+                self._thread = threading.Thread(
+                    target=self._run,
+                    name='ingest-flusher',
+                    daemon=True,
+                )
+                self._thread.start()
+
+    def _run(self):
+        interval = self.app.config['INGEST_FLUSH_INTERVAL'] / 1000
+        max_rows = self.app.config['INGEST_FLUSH_ROWS']
+        while not self._stopping.is_set():
+            self._flush(self._drain(max_rows, interval))
+        while not self._queue.empty():
+            self._flush(self._drain(max_rows, 0))
+
+    def _drain(self, max_rows, timeout):
+        rows = []
+        deadline = time.monotonic() + timeout
+        while len(rows) < max_rows:
+            try:
+                remaining = deadline - time.monotonic()
+                if remaining > 0:
+                    rows.append(self._queue.get(timeout=remaining))
+                else:
+                    rows.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return rows
+
+    def _flush(self, rows):
+        if not rows:
+            return
+        policy = self.app.config['READING_CONFLICT_POLICY']
+        if policy != 'overwrite':
+            policy = 'ignore'
+        unique = {(row['sensor_id'], row['timestamp']): row for row in rows}
+        with self.app.app_context():
+            dropped = self._write(list(unique.values()), policy)
+        if dropped:
+            with self._lock:
+                self.dropped += dropped
+            count_dropped(dropped)
+
+    def _write(self, rows, policy):
+        attempts = max(self.app.config['INGEST_RETRY_ATTEMPTS'], 1)
+        backoff = self.app.config['INGEST_RETRY_BACKOFF'] / 1000
+        for attempt in range(1, attempts + 1):
+            try:
+                write_readings(rows, policy)
+                db.session.commit()
+                return 0
+            except (DataError, IntegrityError):
+                db.session.rollback()
+                # Retrying will not fix a bad row, such as one for a sensor
+                # deleted since it was buffered. Split the batch so only the
+                # rows that fail on their own are dropped.
+                if len(rows) == 1:
+                    self.app.logger.exception(
+                        'Dropped buffered reading for sensor {} at {}'
+                            .format(rows[0]['sensor_id'], rows[0]['timestamp'])
+                    )
+                    return 1
+                middle = len(rows) // 2
+                return self._write(rows[:middle], policy) \
+                    + self._write(rows[middle:], policy)
+            except Exception:
+                db.session.rollback()
+                if attempt == attempts:
+                    self.app.logger.exception(
+                        'Dropped {} buffered readings after {} attempts'
+                            .format(len(rows), attempts)
+                    )
+                else:
+                    self.app.logger.warning(
+                        'Failed to write {} buffered readings, retrying'
+                            .format(len(rows)),
+                        exc_info=True,
+                    )
+                    time.sleep(backoff * 2 ** (attempt - 1))
+        return len(rows)
+
+ingest_buffer = WriteBehindBuffer(app)
@@ -0,0 +1,127 @@
+import atexit
+from collections import Counter
+from datetime import datetime
+from flask import g, has_request_context, request
+import json
+import logging
+import random
+import threading
+import time
+import uuid
+
+from . import app
+
+sql_logger = logging.getLogger('therminator.sql')
+summary_logger = logging.getLogger('therminator.summary')
+
+
+class RequestIdFilter(logging.Filter):
+    def filter(self, record):
+        if not hasattr(record, 'request_id'):
+            record.request_id = g.get('request_id') if has_request_context() else None
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = dict(
+            time=datetime.utcfromtimestamp(record.created).isoformat() + 'Z',
+            level=record.levelname,
+            logger=record.name,
+            message=record.getMessage(),
+            request_id=getattr(record, 'request_id', None),
+        )
+        entry.update(getattr(record, 'data', {}))
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry)
+
+
+class SummaryLog:
+    # Hot endpoints count events here instead of logging each request. The
+    # totals are written as one line per interval, on the first event after
+    # it elapses, and once more at exit.
+    def __init__(self, name, interval):
+        self.name = name
+        self.interval = interval
+        self._counts = Counter()
+        self._started = time.monotonic()
+        self._lock = threading.Lock()
+        atexit.register(self.flush)
+
+    def count(self, event, amount=1):
+        with self._lock:
+            self._counts[event] += amount
+            if time.monotonic() - self._started < self.interval:
+                return
+            counts, self._counts = self._counts, Counter()
+            started, self._started = self._started, time.monotonic()
+        self._emit(counts, started)
+
+    def flush(self):
+        with self._lock:
+            counts, self._counts = self._counts, Counter()
+            started, self._started = self._started, time.monotonic()
+        self._emit(counts, started)
+
+    def _emit(self, counts, started):
+        if not counts:
+            return
+        summary_logger.info(
+            '{} in the last {:.0f}s: {}'.format(
+                self.name,
+                time.monotonic() - started,
+                ', '.join('{} {}'.format(n, k) for k, n in sorted(counts.items())),
+            ),
+            extra=dict(request_id=None, data=dict(summary=self.name, counts=counts)),
+        )
+
+
+def configure_logging(app):
+    handler = logging.StreamHandler()
+    handler.addFilter(RequestIdFilter())
+    if app.config['LOG_FORMAT'] == 'json':
+        handler.setFormatter(JsonFormatter())
+    else:
+        handler.setFormatter(logging.Formatter(
+            '%(asctime)s %(levelname)s [%(request_id)s] %(name)s: %(message)s',
+        ))
+    level = app.config['LOG_LEVEL']
+    app.logger.handlers[:] = [handler]
+    app.logger.setLevel(level)
+    for logger in sql_logger, summary_logger:
+        logger.addHandler(handler)
+        logger.setLevel(level)
+        logger.propagate = False
+
+def log_query(statement, elapsed):
+    elapsed_ms = elapsed * 1000
+    slow = elapsed_ms >= app.config['SQL_LOG_SLOW_MS']
+    if not slow and random.random() >= app.config['SQL_LOG_SAMPLE_RATE']:
+        return
+    sql_logger.log(
+        logging.WARNING if slow else logging.INFO,
+        '{} query took {:.1f}ms'.format('Slow' if slow else 'Sampled', elapsed_ms),
+        extra=dict(data=dict(
+            duration_ms=round(elapsed_ms, 3),
+            slow=slow,
+            statement=' '.join(statement.split()),
+        )),
+    )
+
+@app.before_request
+def assign_request_id():
+    g.request_id = request.headers.get('X-Request-ID', '')[:200] or uuid.uuid4().hex
+
+@app.after_request
+def expose_request_id(response):
+    request_id = g.get('request_id')
+    if request_id:
+        response.headers['X-Request-ID'] = request_id
+    return response
+
+
+configure_logging(app)
+
+ingest_summary = SummaryLog('Readings', app.config['LOG_SUMMARY_INTERVAL'])
+auth_summary = SummaryLog('API authentication', app.config['LOG_SUMMARY_INTERVAL'])
@@ -0,0 +1,114 @@
+from flask import Response, abort, g, request
+import hmac
+from http import HTTPStatus
+import os
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+from sqlalchemy import event
+from sqlalchemy.pool import Pool
+import time
+
+from . import app
+
+# Under gunicorn, point prometheus_multiproc_dir at an empty directory
+# before the app is imported. Every worker then writes its samples to
+# files there and /metrics aggregates them, whichever worker serves it.
+MULTIPROC_DIR = os.getenv('prometheus_multiproc_dir')
+
+readings_total = Counter(
+    'therminator_readings_total',
+    'Readings submitted to the API, by outcome.',
+    ['outcome'],
+)
+
+dropped_total = Counter(
+    'therminator_ingest_dropped_total',
+    'Buffered readings dropped after every attempt to write them failed.',
+)
+
+auth_total = Counter(
+    'therminator_auth_total',
+    'Authentication attempts, by method and outcome.',
+    ['method', 'outcome'],
+)
+
+requests_total = Counter(
+    'therminator_requests_total',
+    'HTTP requests served, by endpoint and status code.',
+    ['endpoint', 'method', 'status'],
+)
+
+request_duration = Histogram(
+    'therminator_request_duration_seconds',
+    'Time spent serving HTTP requests, by endpoint.',
+    ['endpoint', 'method'],
+    buckets=(.005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10),
+)
+
+db_connections = Gauge(
+    'therminator_db_connections',
+    'Database connections held by the pool, by state.',
+    ['state'],
+    multiprocess_mode='livesum',
+)
+
+def count_readings(outcome, amount=1):
+    if amount:
+        readings_total.labels(outcome).inc(amount)
+
+def count_dropped(amount):
+    dropped_total.inc(amount)
+
+def count_auth(method, outcome):
+    auth_total.labels(method, outcome).inc()
+
+@event.listens_for(Pool, 'connect')
+def count_connection_opened(dbapi_connection, connection_record):
+    db_connections.labels('open').inc()
+
+@event.listens_for(Pool, 'close')
+def count_connection_closed(dbapi_connection, connection_record):
+    db_connections.labels('open').dec()
+
+@event.listens_for(Pool, 'checkout')
+def count_connection_checkout(dbapi_connection, connection_record, proxy):
+    db_connections.labels('checked_out').inc()
+
+@event.listens_for(Pool, 'checkin')
+def count_connection_checkin(dbapi_connection, connection_record):
+    db_connections.labels('checked_out').dec()
+
+@app.after_request
+def observe_request(response):
+    started = g.get('request_started')
+    endpoint = request.endpoint or 'unknown'
+    if started is not None and endpoint != 'metrics':
+        request_duration.labels(endpoint, request.method) \
+            .observe(time.monotonic() - started)
+        requests_total.labels(
+            endpoint,
+            request.method,
+            str(response.status_code),
+        ).inc()
+    return response
+
+@app.route('/metrics')
+def metrics():
+    token = app.config['METRICS_TOKEN']
+    supplied = request.headers.get('Authorization', '')
+    if not token or not hmac.compare_digest(supplied, 'Bearer ' + token):
+        abort(HTTPStatus.UNAUTHORIZED)
+    if MULTIPROC_DIR:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return Response(generate_latest(registry), mimetype=CONTENT_TYPE_LATEST)
@@ -1,9 +1,18 @@
-from . import app, db, bcrypt
+from . import app, db, bcrypt, ddl
+from .passwords import password_slot
+from datetime import datetime, timedelta
+import dateutil.parser
 from flask_login import UserMixin
 from functools import wraps
+import pytz
+from sqlalchemy.ext.declarative import declared_attr
 from sqlalchemy.orm import validates
 import sqlalchemy.dialects.postgresql as psql
 
+FIELDS = ('timestamp', 'int_temp', 'ext_temp', 'humidity', 'resistance')
+MEASUREMENTS = ('int_temp', 'ext_temp', 'humidity', 'resistance')
+OFFLINE_AFTER = timedelta(hours=1)
+
 def validates_presence(f):
     @wraps(f)
     def validator(self, key, value):
@@ -12,6 +21,17 @@ def validates_presence(f):
         return f(self, key, value)
     return validator
 
+def validates_number(f):
+    @wraps(f)
+    def validator(self, key, value):
+        if value is not None:
+            try:
+                value = float(value)
+            except (TypeError, ValueError) as e:
+                raise ValueError('{} must be a number'.format(key)) from e
+        return f(self, key, value)
+    return validator
+
 
 class User(db.Model, UserMixin):
     __tablename__ = 'users'
@@ -42,14 +62,16 @@ class User(db.Model, UserMixin):
         return '<User id={} email={}>'.format(self.id, self.email)
 
     def is_correct_password(self, plaintext):
-        return bcrypt.check_password_hash(self.password, plaintext)
+        with password_slot():
+            return bcrypt.check_password_hash(self.password, plaintext)
 
     @validates('password')
     def validates_password(self, key, value):
-        return bcrypt.generate_password_hash(
-            value,
-            app.config['BCRYPT_LOG_ROUNDS'],
-        ).decode()
+        with password_slot():
+            return bcrypt.generate_password_hash(
+                value,
+                app.config['BCRYPT_LOG_ROUNDS'],
+            ).decode()
 
 
 class Home(db.Model):
@@ -94,14 +116,20 @@ class Sensor(db.Model):
         server_default=db.func.gen_random_uuid(),
         unique=True,
     )
+    # Not a foreign key: readings is partitioned and its primary key is
+    # (id, timestamp), so a deleted reading simply leaves latest unset.
+    latest_reading_id = db.Column(db.Integer)
     readings = db.relationship(
         'Reading',
         backref='sensor',
         lazy='dynamic',
         order_by='Reading.timestamp',
     )
-
-    _latest_reading = None
+    latest = db.relationship(
+        'Reading',
+        primaryjoin='Reading.id == foreign(Sensor.latest_reading_id)',
+        viewonly=True,
+    )
 
     def __init__(self, home, name):
         self.home = home
@@ -111,18 +139,29 @@ class Sensor(db.Model):
         return '<Sensor id={} name={}>'.format(self.id, self.name)
 
     def latest_reading(self):
-        if not self._latest_reading:
-            unordered = self.readings.order_by(None)
-            self._latest_reading = unordered.order_by(Reading.timestamp.desc()).first()
-        return self._latest_reading
+        return self.latest
+
+    def status(self, now=None):
+        if self.latest is None:
+            return 'no data'
+        if self.latest.timestamp < (now or datetime.utcnow()) - OFFLINE_AFTER:
+            return 'offline'
+        return 'online'
 
 
 class Reading(db.Model):
     __tablename__ = 'readings'
     __table_args__ = (
+        # Covers the measurements so day queries are index-only scans.
         db.UniqueConstraint(
             'sensor_id', 'timestamp',
-            name='sensor_id_timestamp_unq'
+            name='sensor_id_timestamp_unq',
+            info={'include': MEASUREMENTS},
+        ),
+        db.Index(
+            'ix_readings_timestamp_brin',
+            'timestamp',
+            postgresql_using='brin',
         ),
         db.CheckConstraint(
             'humidity >= 0 AND humidity <= 100',
@@ -132,13 +171,14 @@ class Reading(db.Model):
             'resistance >= 0',
             name='resistance_must_be_positive',
         ),
+        {'info': {'partition_by': 'RANGE ("timestamp")'}},
     )
 
     id = db.Column(db.Integer, primary_key=True, autoincrement=True)
     sensor_id = db.Column(db.Integer, db.ForeignKey('sensors.id'), nullable=False)
-    timestamp = db.Column(db.DateTime, index=True, nullable=False)
+    timestamp = db.Column(db.DateTime, primary_key=True)
     int_temp = db.Column(db.Float, nullable=False, server_default='0.0')
-    ext_temp = db.Column(db.Float, nullable=False, index=True)
+    ext_temp = db.Column(db.Float, nullable=False)
     humidity = db.Column(db.Float, nullable=False, server_default='0.0')
     resistance = db.Column(db.Float, nullable=False, server_default='0.0')
 
@@ -191,10 +231,25 @@ class Reading(db.Model):
     @validates('timestamp')
     @validates_presence
     def validate_timestamp(self, key, value):
+        if isinstance(value, str):
+            try:
+                value = dateutil.parser.parse(value)
+            except (OverflowError, ValueError) as e:
+                raise ValueError('timestamp must be an ISO 8601 date and time') from e
+        if not isinstance(value, datetime):
+            raise ValueError('timestamp must be an ISO 8601 date and time')
+        if value.tzinfo:
+            value = value.astimezone(pytz.utc).replace(tzinfo=None)
+        return value
+
+    @validates('int_temp')
+    @validates_number
+    def validate_int_temp(self, key, value):
         return value
 
     @validates('ext_temp')
     @validates_presence
+    @validates_number
     def validate_ext_temp(self, key, value):
         return value
 
@@ -211,7 +266,84 @@ class Reading(db.Model):
 
     @validates('resistance')
     @validates_presence
+    @validates_number
     def validate_resistance(self, key, value):
         if value < 0:
             return 0.0
         return value
+
+
+class RollupMixin:
+    count = db.Column(db.Integer, nullable=False)
+    int_temp_min = db.Column(db.Float, nullable=False)
+    int_temp_max = db.Column(db.Float, nullable=False)
+    int_temp_sum = db.Column(db.Float, nullable=False)
+    ext_temp_min = db.Column(db.Float, nullable=False)
+    ext_temp_max = db.Column(db.Float, nullable=False)
+    ext_temp_sum = db.Column(db.Float, nullable=False)
+    humidity_min = db.Column(db.Float, nullable=False)
+    humidity_max = db.Column(db.Float, nullable=False)
+    humidity_sum = db.Column(db.Float, nullable=False)
+    resistance_min = db.Column(db.Float, nullable=False)
+    resistance_max = db.Column(db.Float, nullable=False)
+    resistance_sum = db.Column(db.Float, nullable=False)
+    # Bumped by every write to the bucket, so it also serves as the
+    # validator for cached day listings.
+    updated_at = db.Column(
+        db.DateTime,
+        nullable=False,
+        server_default=db.text("timezone('UTC', clock_timestamp())"),
+    )
+
+    @declared_attr
+    def sensor_id(cls):
+        return db.Column(
+            db.Integer,
+            db.ForeignKey('sensors.id'),
+            primary_key=True,
+        )
+
+    def summary(self, name):
+        return dict(
+            min=getattr(self, name + '_min'),
+            max=getattr(self, name + '_max'),
+            mean=getattr(self, name + '_sum') / self.count,
+        )
+
+    def as_dict(self):
+        return dict(
+            count=self.count,
+            int_temp=self.summary('int_temp'),
+            ext_temp=self.summary('ext_temp'),
+            humidity=self.summary('humidity'),
+            resistance=self.summary('resistance'),
+        )
+
+
+class HourlyRollup(RollupMixin, db.Model):
+    __tablename__ = 'hourly_rollups'
+
+    hour = db.Column(db.DateTime, primary_key=True)
+
+    def __repr__(self):
+        return '<HourlyRollup sensor_id={} hour={} count={}>' \
+            .format(self.sensor_id, self.hour, self.count)
+
+    def as_dict(self):
+        return dict(
+            super().as_dict(),
+            hour=self.hour.strftime('%Y-%m-%dT%H:%MZ'),
+        )
+
+
+class DailyRollup(RollupMixin, db.Model):
+    __tablename__ = 'daily_rollups'
+
+    day = db.Column(db.Date, primary_key=True)
+
+    def __repr__(self):
+        return '<DailyRollup sensor_id={} day={} count={}>' \
+            .format(self.sensor_id, self.day, self.count)
+
+    def as_dict(self):
+        return dict(super().as_dict(), day=self.day.isoformat())
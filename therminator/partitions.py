@@ -0,0 +1,128 @@
+from datetime import date, datetime
+from psycopg2.errorcodes import LOCK_NOT_AVAILABLE
+from sqlalchemy import event, func, select
+from sqlalchemy.exc import OperationalError
+
+from . import app, db
+from .exc import PartitionUnavailable
+from .models import Reading
+
+PARTITION_NAME = 'readings_y{:%Y}m{:%m}'
+
+# Serialises partition creation across processes, since concurrent
+# CREATE TABLE IF NOT EXISTS statements can still collide.
+PARTITION_LOCK = 0x7468726d
+
+CREATE_PARTITION = '''
+CREATE TABLE IF NOT EXISTS {name} PARTITION OF readings
+FOR VALUES FROM ('{start}') TO ('{end}')
+'''
+
+LIST_PARTITIONS = '''
+SELECT child.relname
+FROM pg_inherits
+JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+WHERE pg_inherits.inhparent = 'readings'::regclass
+'''
+
+# Creating a partition takes ACCESS EXCLUSIVE on readings and SHARE ROW
+# EXCLUSIVE on sensors for its foreign key. These are the locks a caller's
+# own transaction can hold that would make a separate creator wait on it.
+CONFLICTING_LOCKS = '''
+SELECT count(*)
+FROM pg_locks
+WHERE pid = pg_backend_pid() AND granted AND (
+    relation = 'readings'::regclass
+    OR (
+        relation = 'sensors'::regclass
+        AND mode NOT IN ('AccessShareLock', 'RowShareLock')
+    )
+)
+'''
+
+# Months with a committed partition, as last read from the catalog. Only
+# filled from a transaction that has committed, so it never runs ahead of
+# the database; cleared when the readings table is dropped.
+known_partitions = set()
+
+def month_start(value):
+    return date(value.year, value.month, 1)
+
+def next_month(month):
+    if month.month == 12:
+        return date(month.year + 1, 1, 1)
+    return date(month.year, month.month + 1, 1)
+
+def months_between(start, end):
+    month, last = month_start(start), month_start(end)
+    while month <= last:
+        yield month
+        month = next_month(month)
+
+def existing_partitions(bind):
+    months = set()
+    for name, in bind.execute(LIST_PARTITIONS):
+        try:
+            months.add(datetime.strptime(name, 'readings_y%Ym%m').date())
+        except ValueError:
+            continue
+    return months
+
+def ensure_partitions(bind, start, end):
+    bind.execute(select([func.pg_advisory_xact_lock(PARTITION_LOCK)]))
+    existing = existing_partitions(bind)
+    created = []
+    for month in months_between(start, end):
+        if month in existing:
+            continue
+        bind.execute(CREATE_PARTITION.format(
+            name=PARTITION_NAME.format(month, month),
+            start=month.isoformat(),
+            end=next_month(month).isoformat(),
+        ))
+        created.append(month)
+    return created
+
+def prepare_partitions(bind, start, end):
+    if set(months_between(start, end)) <= known_partitions:
+        return
+    if bind.execute(CONFLICTING_LOCKS).scalar():
+        # A separate transaction would wait on this one until it ends.
+        ensure_partitions(bind, start, end)
+        return
+    # Otherwise create missing months in a short transaction of their own,
+    # so the exclusive lock on readings is not held until the caller commits.
+    timeout = app.config['READING_PARTITION_LOCK_TIMEOUT']
+    try:
+        with db.engine.begin() as connection:
+            connection.execute('SET LOCAL lock_timeout = {:d}'.format(timeout))
+            ensure_partitions(connection, start, end)
+            existing = existing_partitions(connection)
+    except OperationalError as e:
+        if getattr(e.orig, 'pgcode', None) != LOCK_NOT_AVAILABLE:
+            raise
+        raise PartitionUnavailable(
+            'Storage for these readings is being prepared. Please retry shortly.'
+        ) from e
+    known_partitions.update(existing)
+
+def create_upcoming_partitions(bind, months, today=None):
+    start = month_start(today or datetime.utcnow())
+    end = start
+    for _ in range(months):
+        end = next_month(end)
+    ensure_partitions(bind, start, end)
+    return [PARTITION_NAME.format(m, m) for m in months_between(start, end)]
+
+@event.listens_for(Reading.__table__, 'after_create')
+def create_initial_partitions(target, connection, **kw):
+    known_partitions.clear()
+    create_upcoming_partitions(connection, app.config['READING_PARTITIONS_AHEAD'])
+
+@event.listens_for(Reading.__table__, 'after_drop')
+def forget_partitions(target, connection, **kw):
+    known_partitions.clear()
+
+@event.listens_for(Reading, 'before_insert')
+def prepare_reading_partition(mapper, connection, reading):
+    prepare_partitions(connection, reading.timestamp, reading.timestamp)
@@ -0,0 +1,65 @@
+from contextlib import contextmanager
+from sqlalchemy import func, select
+import threading
+import time
+
+from . import app, db
+from .cache import LRUCache
+
+# Advisory lock class for the bcrypt slots; each slot is (class, n).
+PASSWORD_LOCK = 0x62637279
+
+
+class Throttled(Exception):
+    pass
+
+
+class Throttle:
+    # Attempts are counted per process, so with several gunicorn workers a
+    # client can make up to limit * workers attempts per period.
+    def __init__(self, limit, period, maxsize=10000):
+        self.limit = limit
+        self.period = period
+        self._attempts = LRUCache(maxsize, ttl=period)
+        self._lock = threading.Lock()
+
+    def hit(self, key):
+        now = time.monotonic()
+        with self._lock:
+            started, count = self._attempts.get(key, (now, 0))
+            if now - started > self.period:
+                started, count = now, 0
+            self._attempts.set(key, (started, count + 1))
+        return count < self.limit
+
+
+account_throttle = Throttle(
+    app.config['SIGN_IN_ACCOUNT_LIMIT'],
+    app.config['SIGN_IN_PERIOD'],
+)
+
+address_throttle = Throttle(
+    app.config['SIGN_IN_ADDRESS_LIMIT'],
+    app.config['SIGN_IN_PERIOD'],
+)
+
+def throttle_sign_in(account, address):
+    if not account_throttle.hit(account.lower()) \
+            or not address_throttle.hit(address):
+        raise Throttled('Too many sign in attempts. Please try again later.')
+
+@contextmanager
+def password_slot():
+    # Caps bcrypt work across every worker sharing the database, so a burst
+    # of sign-ins is turned away up front instead of tying up all workers.
+    connection = db.session.connection()
+    for slot in range(app.config['PASSWORD_HASH_SLOTS']):
+        lock = select([func.pg_try_advisory_lock(PASSWORD_LOCK, slot)])
+        if connection.execute(lock).scalar():
+            break
+    else:
+        raise Throttled('The server is busy. Please try again shortly.')
+    try:
+        yield
+    finally:
+        connection.execute(select([func.pg_advisory_unlock(PASSWORD_LOCK, slot)]))
@@ -0,0 +1,155 @@
+from bisect import bisect_left
+from flask import g, has_app_context, request
+import heapq
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+import threading
+import time
+
+from . import app
+from .logs import log_query
+
+QUERY_BUCKETS = (1, 2, 5, 10, 20, 50, 100)
+TIME_BUCKETS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500)
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+class Histogram:
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.sum = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def as_dict(self):
+        buckets = [
+            [bound, count]
+            for bound, count in zip(self.bounds + ('+Inf',), self.counts)
+        ]
+        return dict(count=self.count, sum=self.sum, buckets=buckets)
+
+
+class RequestQueries:
+    def __init__(self, keep):
+        self.keep = keep
+        self.count = 0
+        self.elapsed = 0.0
+        self.slowest = []
+
+    def record(self, statement, elapsed):
+        self.count += 1
+        self.elapsed += elapsed
+        entry = (elapsed, statement)
+        if len(self.slowest) < self.keep:
+            heapq.heappush(self.slowest, entry)
+        elif entry > self.slowest[0]:
+            heapq.heapreplace(self.slowest, entry)
+
+    def top(self):
+        return sorted(self.slowest, reverse=True)
+
+
+class EndpointStats:
+    def __init__(self, keep):
+        self.keep = keep
+        self.queries = Histogram(QUERY_BUCKETS)
+        self.db_time = Histogram(TIME_BUCKETS)
+        self.duration = Histogram(TIME_BUCKETS)
+        self.slowest = []
+
+    def observe(self, queries, duration):
+        self.queries.observe(queries.count)
+        self.db_time.observe(queries.elapsed * 1000)
+        self.duration.observe(duration * 1000)
+        self.slowest = sorted(self.slowest + queries.top(), reverse=True)[:self.keep]
+
+    def as_dict(self):
+        return dict(
+            queries=self.queries.as_dict(),
+            db_time_ms=self.db_time.as_dict(),
+            duration_ms=self.duration.as_dict(),
+            slowest=[
+                dict(ms=round(elapsed * 1000, 3), statement=statement)
+                for elapsed, statement in self.slowest
+            ],
+        )
+
+
+endpoint_stats = {}
+endpoint_stats_lock = threading.Lock()
+
+def query_stats():
+    with endpoint_stats_lock:
+        return {
+            endpoint: stats.as_dict()
+            for endpoint, stats in sorted(endpoint_stats.items())
+        }
+
+def query_budget(endpoint):
+    return app.config['QUERY_BUDGETS'].get(
+        endpoint,
+        app.config['QUERY_BUDGET_DEFAULT'],
+    )
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def start_query_timer(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_started', []).append(time.monotonic())
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def stop_query_timer(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.monotonic() - conn.info['query_started'].pop()
+    log_query(statement, elapsed)
+    queries = g.get('queries') if has_app_context() else None
+    if queries is not None:
+        queries.record(statement, elapsed)
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.monotonic()
+    g.queries = RequestQueries(app.config['QUERY_SLOWEST'])
+
+@app.after_request
+def record_request_queries(response):
+    queries = g.pop('queries', None)
+    if queries is None:
+        return response
+    duration = time.monotonic() - g.request_started
+    endpoint = request.endpoint or 'unknown'
+    response.headers.add(
+        'Server-Timing',
+        'db;dur={:.1f};desc="{} queries", app;dur={:.1f}'.format(
+            queries.elapsed * 1000,
+            queries.count,
+            duration * 1000,
+        ),
+    )
+    with endpoint_stats_lock:
+        stats = endpoint_stats.get(endpoint)
+        if stats is None:
+            stats = endpoint_stats[endpoint] = EndpointStats(
+                app.config['QUERY_SLOWEST'],
+            )
+        stats.observe(queries, duration)
+    budget = query_budget(endpoint)
+    if budget is not None and queries.count > budget:
+        message = '{} ran {} queries (budget {}); slowest: {}'.format(
+            endpoint,
+            queries.count,
+            budget,
+            '; '.join(
+                '{:.1f}ms {}'.format(elapsed * 1000, ' '.join(statement.split()))
+                for elapsed, statement in queries.top()
+            ),
+        )
+        if app.config['QUERY_BUDGET_ACTION'] == 'raise':
+            raise QueryBudgetExceeded(message)
+        app.logger.warning(message)
+    return response
@@ -0,0 +1,192 @@
+from datetime import timedelta
+from sqlalchemy import DateTime, and_, event, func, inspect, literal, select, tuple_
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import object_session
+
+from .models import (
+    MEASUREMENTS,
+    DailyRollup,
+    Home,
+    HourlyRollup,
+    Reading,
+    Sensor,
+)
+
+TOUCHED_DAYS = 'touched_days'
+
+VALUE_COLUMNS = ['count'] + [
+    '{}_{}'.format(name, aggregate)
+    for name in MEASUREMENTS
+    for aggregate in ('min', 'max', 'sum')
+]
+
+def aggregates():
+    columns = [func.count()]
+    for name in MEASUREMENTS:
+        column = getattr(Reading, name)
+        columns += [func.min(column), func.max(column), func.sum(column)]
+    return columns
+
+def modified_now():
+    # clock_timestamp() rather than now(): a transaction that waited on the
+    # row lock must not stamp the bucket earlier than the one it followed.
+    return func.timezone('UTC', func.clock_timestamp())
+
+def local_time(timestamp, timezone):
+    return func.timezone(timezone, func.timezone('UTC', timestamp))
+
+def utc_time(timestamp, timezone):
+    return func.timezone('UTC', func.timezone(timezone, timestamp))
+
+def upsert(model, key, query):
+    table = model.__table__
+    stmt = insert(table).from_select(['sensor_id', key] + VALUE_COLUMNS, query)
+    values = {name: stmt.excluded[name] for name in VALUE_COLUMNS}
+    values['updated_at'] = modified_now()
+    return stmt.on_conflict_do_update(
+        index_elements=['sensor_id', key],
+        set_=values,
+    ).returning(table.c.sensor_id, table.c[key])
+
+def merge(model, key, query):
+    # Folds the aggregates of newly inserted readings into existing buckets.
+    table = model.__table__
+    stmt = insert(table).from_select(['sensor_id', key] + VALUE_COLUMNS, query)
+    current, new = table.c, stmt.excluded
+    values = {'count': current['count'] + new['count'], 'updated_at': modified_now()}
+    for name in MEASUREMENTS:
+        values[name + '_min'] = func.least(current[name + '_min'], new[name + '_min'])
+        values[name + '_max'] = func.greatest(current[name + '_max'], new[name + '_max'])
+        values[name + '_sum'] = current[name + '_sum'] + new[name + '_sum']
+    return stmt.on_conflict_do_update(
+        index_elements=['sensor_id', key],
+        set_=values,
+    ).returning(table.c.sensor_id, table.c[key])
+
+def merge_rollups(bind, keys):
+    if not keys:
+        return []
+    inserted = tuple_(Reading.sensor_id, Reading.timestamp).in_(list(keys))
+    hour = func.date_trunc('hour', Reading.timestamp)
+    hourly = select([Reading.sensor_id, hour] + aggregates()) \
+        .where(inserted).group_by(Reading.sensor_id, hour)
+    bind.execute(merge(HourlyRollup, 'hour', hourly))
+    day = func.date(local_time(Reading.timestamp, Home.timezone))
+    daily = select([Reading.sensor_id, day] + aggregates()) \
+        .select_from(Reading.__table__.join(Sensor.__table__).join(Home.__table__)) \
+        .where(inserted).group_by(Reading.sensor_id, day)
+    return bind.execute(merge(DailyRollup, 'day', daily)).fetchall()
+
+def refresh_rollups(bind, sensor_id, start, end):
+    first_hour = start.replace(minute=0, second=0, microsecond=0)
+    last_hour = end.replace(minute=0, second=0, microsecond=0)
+    hour = func.date_trunc('hour', Reading.timestamp)
+    hourly = select([Reading.sensor_id, hour] + aggregates()).where(and_(
+        Reading.sensor_id == sensor_id,
+        Reading.timestamp >= first_hour,
+        Reading.timestamp < last_hour + timedelta(hours=1),
+    )).group_by(Reading.sensor_id, hour)
+    bind.execute(upsert(HourlyRollup, 'hour', hourly))
+
+    timezone = select([Home.timezone]) \
+        .where(and_(Sensor.home_id == Home.id, Sensor.id == sensor_id)) \
+        .as_scalar()
+    first_day = func.date_trunc(
+        'day',
+        local_time(literal(start, DateTime), timezone),
+        type_=DateTime,
+    )
+    last_day = func.date_trunc(
+        'day',
+        local_time(literal(end, DateTime), timezone),
+        type_=DateTime,
+    )
+    day = func.date(local_time(Reading.timestamp, timezone))
+    daily = select([Reading.sensor_id, day] + aggregates()).where(and_(
+        Reading.sensor_id == sensor_id,
+        Reading.timestamp >= utc_time(first_day, timezone),
+        Reading.timestamp < utc_time(last_day + timedelta(days=1), timezone),
+    )).group_by(Reading.sensor_id, day)
+    return bind.execute(upsert(DailyRollup, 'day', daily)).fetchall()
+
+def refresh_written_rollups(bind, written):
+    # New readings are merged in as deltas. Overwritten ones may have moved
+    # a minimum or maximum, so their buckets are recomputed a day at a time.
+    created = [key for key, status in written.items() if status == 'created']
+    touched = merge_rollups(bind, created)
+    spans = {}
+    for (sensor_id, timestamp), status in written.items():
+        if status != 'updated':
+            continue
+        span = (sensor_id, timestamp.date())
+        lower, upper = spans.get(span, (timestamp, timestamp))
+        spans[span] = (min(lower, timestamp), max(upper, timestamp))
+    for (sensor_id, _), (start, end) in spans.items():
+        touched += refresh_rollups(bind, sensor_id, start, end)
+    return touched
+
+def refresh_latest_readings(bind, sensor_ids):
+    # Lock the sensors first. Under READ COMMITTED the UPDATE below then
+    # takes its snapshot after any concurrent writer has committed, so an
+    # older reading cannot replace a newer latest it could not see. The
+    # readings INSERT already holds KEY SHARE on these rows for its foreign
+    # key, so take NO KEY UPDATE, which does not conflict with it.
+    sensor_ids = sorted(sensor_ids)
+    bind.execute(
+        select([Sensor.id]).where(Sensor.id.in_(sensor_ids))
+            .order_by(Sensor.id).with_for_update(key_share=True)
+    )
+    latest = select([Reading.id]) \
+        .where(Reading.sensor_id == Sensor.id) \
+        .order_by(Reading.timestamp.desc()).limit(1) \
+        .as_scalar()
+    bind.execute(
+        Sensor.__table__.update()
+            .where(Sensor.id.in_(sensor_ids))
+            .values(latest_reading_id=latest)
+    )
+
+def record_touched_days(session, days):
+    session.info.setdefault(TOUCHED_DAYS, set()).update(
+        (sensor_id, day) for sensor_id, day in days
+    )
+
+def rebuild_rollups(bind, sensor_id, start, end):
+    bind.execute(HourlyRollup.__table__.delete().where(and_(
+        HourlyRollup.sensor_id == sensor_id,
+        HourlyRollup.hour >= start.replace(minute=0, second=0, microsecond=0),
+        HourlyRollup.hour <= end,
+    )))
+    timezone = select([Home.timezone]) \
+        .where(and_(Sensor.home_id == Home.id, Sensor.id == sensor_id)) \
+        .as_scalar()
+    deleted = bind.execute(DailyRollup.__table__.delete().where(and_(
+        DailyRollup.sensor_id == sensor_id,
+        DailyRollup.day >= func.date(local_time(literal(start, DateTime), timezone)),
+        DailyRollup.day <= func.date(local_time(literal(end, DateTime), timezone)),
+    )).returning(DailyRollup.sensor_id, DailyRollup.day))
+    days = {tuple(row) for row in deleted}
+    days.update(tuple(row) for row in refresh_rollups(bind, sensor_id, start, end))
+    return sorted(days)
+
+@event.listens_for(Reading, 'after_insert')
+def merge_reading_rollups(mapper, connection, reading):
+    days = merge_rollups(connection, [(reading.sensor_id, reading.timestamp)])
+    record_touched_days(object_session(reading), days)
+    refresh_latest_readings(connection, [reading.sensor_id])
+
+@event.listens_for(Reading, 'after_update')
+def refresh_reading_rollups(mapper, connection, reading):
+    # Rebuild the bucket the reading left as well as the one it is in now,
+    # so a moved reading does not linger in its old hour and day.
+    state = inspect(reading)
+    previous = tuple(
+        (state.attrs[name].history.deleted or [getattr(reading, name)])[0]
+        for name in ('sensor_id', 'timestamp')
+    )
+    current = (reading.sensor_id, reading.timestamp)
+    days = []
+    for sensor_id, timestamp in {previous, current}:
+        days += rebuild_rollups(connection, sensor_id, timestamp, timestamp)
+    record_touched_days(object_session(reading), days)
+    refresh_latest_readings(connection, {previous[0], current[0]})
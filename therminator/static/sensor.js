@@ -1,29 +1,43 @@
 google.charts.load('current', {'packages': ['corechart']});
 google.charts.setOnLoadCallback(function() {
   var container = document.getElementById('chart');
+  var embedded = document.getElementById('chart-data');
+  var cursor = container.dataset.cursor;
+  var data, chart, options, latest;
 
-  $.getJSON(container.dataset.source, function(readings) {
+  if (embedded) {
+    draw(JSON.parse(embedded.textContent));
+  } else {
+    $.ajax({
+      url: container.dataset.source,
+      dataType: 'json',
+      headers: { Accept: 'application/vnd.therminator.columnar+json' },
+    }).done(draw);
+  }
+
+  function draw(readings) {
     var min_temp = 0, max_temp = 0, min_humidity = 0, max_humidity = 0;
+    var ext_temp = readings.ext_temp, humidity = readings.humidity;
 
-    for (var i=0; i<readings.length; i++) {
-      if (readings[i].ext_temp < readings[min_temp].ext_temp) {
+    for (var i=0; i<readings.timestamp.length; i++) {
+      if (ext_temp[i] < ext_temp[min_temp]) {
         min_temp = i;
       }
-      if (readings[i].ext_temp > readings[max_temp].ext_temp) {
+      if (ext_temp[i] > ext_temp[max_temp]) {
         max_temp = i;
       }
-      if (readings[i].humidity < readings[min_humidity].humidity) {
+      if (humidity[i] < humidity[min_humidity]) {
         min_humidity = i;
       }
-      if (readings[i].humidity > readings[max_humidity].humidity) {
+      if (humidity[i] > humidity[max_humidity]) {
         max_humidity = i;
       }
     }
 
-    var temp_range = readings[max_temp].ext_temp - readings[min_temp].ext_temp;
-    var humidity_range = readings[max_humidity].humidity - readings[min_humidity].humidity;
+    var temp_range = ext_temp[max_temp] - ext_temp[min_temp];
+    var humidity_range = humidity[max_humidity] - humidity[min_humidity];
 
-    var data = new google.visualization.DataTable();
+    data = new google.visualization.DataTable();
 
     data.addColumn('datetime', 'Timestamp');
     data.addColumn('number', 'External Temperature');
@@ -37,30 +51,16 @@ google.charts.setOnLoadCallback(function() {
     data.addColumn('number', 'Internal Temperature');
     data.addColumn({type: 'string', role: 'tooltip'});
 
-    for (var i=0; i<readings.length; i++) {
-      var timestamp = new Date(readings[i].timestamp);
-      var ext_temp_f = readings[i].ext_temp * 9/5 + 32;
-      var int_temp_f = readings[i].int_temp * 9/5 + 32;
-      var humidity = readings[i].humidity;
-      var luminosity = Math.pow(10, 6) / readings[i].resistance;
-      data.addRow([
-        timestamp,
-        ext_temp_f,
-        ext_temp_f.toFixed(1) + '℉',
-        (i==min_temp || i==max_temp) ? ext_temp_f.toFixed(1) + '℉' : null,
-        humidity,
-        humidity.toFixed(1) + '%',
-        (i==min_humidity || i==max_humidity) ? humidity.toFixed(1) + '%' : null,
-        luminosity,
-        luminosity.toFixed(2),
-        int_temp_f,
-        int_temp_f.toFixed(1) + '℉'
-      ]);
-    }
+    addRows(readings, function(i) {
+      return [
+        (i==min_temp || i==max_temp),
+        (i==min_humidity || i==max_humidity),
+      ];
+    });
 
-    var chart = new google.visualization.LineChart(container);
+    chart = new google.visualization.LineChart(container);
     var title = container.dataset.title;
-    var options = {
+    options = {
       colors: ['#f44336', '#2196f3', '#fdd835', '#ff9800'],
       focusTarget: 'category',
       hAxis: { format: 'HH:mm', title: '' },
@@ -96,5 +96,58 @@ google.charts.setOnLoadCallback(function() {
     };
 
     chart.draw(data, options);
-  });
+
+    if (container.dataset.delta) {
+      setInterval(poll, container.dataset.pollInterval * 1000);
+    }
+  }
+
+  function addRows(readings, annotate) {
+    for (var i=0; i<readings.timestamp.length; i++) {
+      var timestamp = new Date((readings.epoch + readings.timestamp[i]) * 1000);
+      if (latest && timestamp <= latest) {
+        continue;
+      }
+      var ext_temp_f = readings.ext_temp[i] * 9/5 + 32;
+      var int_temp_f = readings.int_temp[i] * 9/5 + 32;
+      var humidity = readings.humidity[i];
+      var luminosity = Math.pow(10, 6) / readings.resistance[i];
+      var marks = annotate ? annotate(i) : [false, false];
+      data.addRow([
+        timestamp,
+        ext_temp_f,
+        ext_temp_f.toFixed(1) + '℉',
+        marks[0] ? ext_temp_f.toFixed(1) + '℉' : null,
+        humidity,
+        humidity.toFixed(1) + '%',
+        marks[1] ? humidity.toFixed(1) + '%' : null,
+        luminosity,
+        luminosity.toFixed(2),
+        int_temp_f,
+        int_temp_f.toFixed(1) + '℉'
+      ]);
+      latest = timestamp;
+    }
+  }
+
+  // Appends only the readings newer than the cursor; an unchanged sensor
+  // answers 204 and the chart is left alone.
+  function poll() {
+    $.ajax({
+      url: container.dataset.delta,
+      data: { cursor: cursor },
+      dataType: 'json',
+      headers: { Accept: 'application/vnd.therminator.columnar+json' },
+    }).done(function(readings, status, xhr) {
+      if (xhr.status == 204) {
+        return;
+      }
+      addRows(readings);
+      cursor = readings.cursor;
+      chart.draw(data, options);
+      if (readings.more) {
+        poll();
+      }
+    });
+  }
 });
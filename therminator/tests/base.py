@@ -2,6 +2,7 @@ from flask_testing import TestCase
 import logging
 import unittest
 from therminator import app, db
+from therminator.api.cache import response_cache
 
 
 class TestCase(TestCase):
@@ -13,6 +14,7 @@ class TestCase(TestCase):
     def tearDown(self):
         db.session.remove()
         db.drop_all()
+        response_cache.clear()
 
     def create_app(self):
         app.config.from_object('therminator.config.Test')
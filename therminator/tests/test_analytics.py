@@ -0,0 +1,42 @@
+import unittest
+import numpy as np
+from base import TestCase
+from therminator import analytics
+
+class TestAnalytics(TestCase):
+    def test_dew_point(self):
+        dew_point = analytics.dew_point(np.array([20.0, 20.0]), np.array([50.0, 0.0]))
+        self.assertAlmostEqual(dew_point[0], 9.3, places=1)
+        self.assertTrue(np.isnan(dew_point[1]))
+
+    def test_heat_index(self):
+        temp = analytics.celsius(np.array([70.0, 90.0]))
+        heat_index = analytics.fahrenheit(analytics.heat_index(temp, np.array([50.0, 50.0])))
+        self.assertAlmostEqual(heat_index[0], 69.05, places=2)
+        self.assertAlmostEqual(heat_index[1], 94.6, places=2)
+
+    def test_luminosity(self):
+        luminosity = analytics.luminosity(np.array([1000.0, 0.0]))
+        self.assertEqual(luminosity[0], 1000.0)
+        self.assertTrue(np.isnan(luminosity[1]))
+
+    def test_degree_days(self):
+        timestamps = np.array([0.0, 43200.0, 86400.0])
+        heating, cooling = analytics.degree_days(timestamps, np.array([8.0, 8.0, 8.0]), 18.0)
+        self.assertAlmostEqual(heating, 10.0)
+        self.assertEqual(cooling, 0.0)
+
+    def test_summarize(self):
+        stats = analytics.summarize(
+            np.array([0.0, 60.0, 120.0]),
+            np.array([20.0, np.nan, 10.0]),
+        )
+        self.assertEqual(stats['count'], 2)
+        self.assertEqual(stats['min']['value'], 10.0)
+        self.assertEqual(stats['min']['timestamp'], analytics.from_epoch(120))
+        self.assertEqual(stats['max']['timestamp'], analytics.from_epoch(0))
+        self.assertEqual(stats['mean'], 15.0)
+        self.assertEqual(stats['percentiles']['p50'], 15.0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,10 +1,17 @@
 import unittest
-from datetime import date, datetime
+from datetime import date, datetime, timedelta
 from flask import json, url_for
 from http import HTTPStatus
 from pytz import timezone
+import struct
+from unittest import mock
 from base import TestCase
 from factories import create_user, create_home, create_sensor, create_reading
+from therminator import db
+from therminator.api.cache import response_cache
+from therminator.api.formats import BINARY_HEADER
+from therminator.api.views import resolve_sensor, sensor_cache
+from therminator.ingest import ingest_buffer, write_readings
 
 class TestApiV1(TestCase):
     def test_list_readings_by_date(self):
@@ -44,6 +51,253 @@ class TestApiV1(TestCase):
         self.assertEqual(response.status_code, HTTPStatus.OK)
         self.assertEqual(json.loads(response.data.decode()), [])
 
+    def test_list_readings_streaming(self):
+        home = create_home(timezone='UTC')
+        sensor = create_sensor(home=home)
+        readings = [
+            create_reading(sensor=sensor, timestamp=datetime(2017, 5, 30, n))
+            for n in range(3)
+        ]
+        with self.client:
+            response = self.client.get(
+                url_for(
+                    'api_v1_list_readings',
+                    sensor_uuid=sensor.uuid,
+                    date=date(2017, 5, 30),
+                    stream='true',
+                ),
+                headers={
+                    'Authorization': home.user.api_key,
+                    'Accept': 'application/json',
+                },
+            )
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertEqual(
+            json.loads(response.data.decode()),
+            [r.as_dict() for r in readings],
+        )
+
+    def test_list_readings_columnar(self):
+        home = create_home(timezone='UTC')
+        sensor = create_sensor(home=home)
+        for n in range(2):
+            create_reading(
+                sensor=sensor,
+                timestamp=datetime(2017, 5, 30, 0, n),
+                ext_temp=20.0 + n,
+            )
+        with self.client:
+            response = self.client.get(
+                url_for(
+                    'api_v1_list_readings',
+                    sensor_uuid=sensor.uuid,
+                    date=date(2017, 5, 30),
+                    fields='ext_temp',
+                ),
+                headers={
+                    'Authorization': home.user.api_key,
+                    'Accept': 'application/vnd.therminator.columnar+json',
+                },
+            )
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertEqual(
+            json.loads(response.data.decode()),
+            dict(
+                epoch=1496102400,
+                fields=['ext_temp'],
+                timestamp=[0, 60],
+                ext_temp=[20.0, 21.0],
+            ),
+        )
+
+    def test_list_readings_binary(self):
+        home = create_home(timezone='UTC')
+        sensor = create_sensor(home=home)
+        create_reading(
+            sensor=sensor,
+            timestamp=datetime(2017, 5, 30),
+            ext_temp=20.5,
+            humidity=40.0,
+        )
+        with self.client:
+            response = self.client.get(
+                url_for(
+                    'api_v1_list_readings',
+                    sensor_uuid=sensor.uuid,
+                    date=date(2017, 5, 30),
+                    format='binary',
+                    fields='ext_temp,humidity',
+                ),
+                headers={
+                    'Authorization': home.user.api_key,
+                    'Accept': 'application/json',
+                },
+            )
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        header = BINARY_HEADER.unpack_from(response.data)
+        self.assertEqual(header, (b'THRM', 1, 2, 0, 1, 1496102400))
+        body = response.data[BINARY_HEADER.size:]
+        self.assertEqual(
+            struct.unpack('<2B2xi2f', body),
+            (1, 2, 0, 20.5, 40.0),
+        )
+
+    def test_list_readings_not_modified(self):
+        home = create_home(timezone='UTC')
+        sensor = create_sensor(home=home)
+        create_reading(sensor=sensor, timestamp=datetime(2017, 5, 30, 12))
+        url = url_for(
+            'api_v1_list_readings',
+            sensor_uuid=sensor.uuid,
+            date=date(2017, 5, 30),
+        )
+        headers = {
+            'Authorization': home.user.api_key,
+            'Accept': 'application/json',
+        }
+        with self.client:
+            response = self.client.get(url, headers=headers)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertTrue(response.cache_control.no_cache)
+        etag, _ = response.get_etag()
+        with self.client:
+            response = self.client.get(
+                url,
+                headers=dict(headers, **{'If-None-Match': '"{}"'.format(etag)}),
+            )
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+        create_reading(sensor=sensor, timestamp=datetime(2017, 5, 30, 6))
+        with self.client:
+            response = self.client.get(
+                url,
+                headers=dict(headers, **{'If-None-Match': '"{}"'.format(etag)}),
+            )
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+
+    def test_list_readings_caches_days_beyond_ingest_reach(self):
+        home = create_home(timezone='UTC')
+        sensor = create_sensor(home=home)
+        create_reading(sensor=sensor, timestamp=datetime(2017, 5, 30, 12))
+        self.app.config['READING_MAX_AGE'] = 366 * 86400
+        try:
+            with self.client:
+                response = self.client.get(
+                    url_for(
+                        'api_v1_list_readings',
+                        sensor_uuid=sensor.uuid,
+                        date=date(2017, 5, 30),
+                    ),
+                    headers={
+                        'Authorization': home.user.api_key,
+                        'Accept': 'application/json',
+                    },
+                )
+        finally:
+            self.app.config['READING_MAX_AGE'] = None
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertEqual(response.cache_control.max_age, 30 * 86400)
+        self.assertFalse(response.cache_control.no_cache)
+
+    def test_list_readings_modified_by_overwrite(self):
+        home = create_home(timezone='UTC')
+        sensor = create_sensor(home=home)
+        create_reading(sensor=sensor, timestamp=datetime(2017, 5, 30, 12))
+        url = url_for(
+            'api_v1_list_readings',
+            sensor_uuid=sensor.uuid,
+            date=date(2017, 5, 30),
+        )
+        headers = {
+            'Authorization': home.user.api_key,
+            'Accept': 'application/json',
+        }
+        with self.client:
+            response = self.client.get(url, headers=headers)
+        etag, _ = response.get_etag()
+        self.assertGreater(response.last_modified, datetime(2017, 5, 30, 12))
+        with self.client:
+            response = self.client.post(
+                url_for(
+                    'api_v1_create_reading',
+                    sensor_uuid=sensor.uuid,
+                    on_conflict='overwrite',
+                ),
+                data=json.dumps({
+                    'timestamp': '2017-05-30T12:00:00Z',
+                    'ext_temp': 30.0,
+                    'humidity': 50.0,
+                    'resistance': 1500.0,
+                }),
+                headers=dict(headers, **{'Content-Type': 'application/json'}),
+            )
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        with self.client:
+            response = self.client.get(
+                url,
+                headers=dict(headers, **{'If-None-Match': '"{}"'.format(etag)}),
+            )
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertEqual(response.json[0]['ext_temp'], 30.0)
+        self.assertNotEqual(response.get_etag()[0], etag)
+
+    def test_list_readings_cached_until_ingest(self):
+        home = create_home(timezone='UTC')
+        sensor = create_sensor(home=home)
+        create_reading(sensor=sensor, timestamp=datetime(2017, 5, 30, 12))
+        url = url_for(
+            'api_v1_list_readings',
+            sensor_uuid=sensor.uuid,
+            date=date(2017, 5, 30),
+        )
+        headers = {
+            'Authorization': home.user.api_key,
+            'Accept': 'application/json',
+        }
+        hits = response_cache.stats()['hits']
+        with self.client:
+            first = self.client.get(url, headers=headers)
+            second = self.client.get(url, headers=headers)
+        self.assertEqual(second.data, first.data)
+        self.assertEqual(response_cache.stats()['hits'], hits + 1)
+        with self.client:
+            response = self.client.post(
+                url_for('api_v1_create_reading', sensor_uuid=sensor.uuid),
+                data=json.dumps({
+                    'timestamp': '2017-05-30T13:00:00Z',
+                    'int_temp': 20.0,
+                    'ext_temp': 21.0,
+                    'humidity': 50.0,
+                    'resistance': 1500.0,
+                }),
+                headers=dict(headers, **{'Content-Type': 'application/json'}),
+            )
+        self.assertEqual(response.status_code, HTTPStatus.CREATED)
+        with self.client:
+            response = self.client.get(url, headers=headers)
+        self.assertEqual(len(json.loads(response.data.decode())), 2)
+
+    def test_list_readings_revalidates_cached_payload(self):
+        home = create_home(timezone='UTC')
+        sensor = create_sensor(home=home)
+        create_reading(sensor=sensor, timestamp=datetime(2017, 5, 30, 12))
+        url = url_for(
+            'api_v1_list_readings',
+            sensor_uuid=sensor.uuid,
+            date=date(2017, 5, 30),
+        )
+        headers = {
+            'Authorization': home.user.api_key,
+            'Accept': 'application/json',
+        }
+        with self.client:
+            self.client.get(url, headers=headers)
+        # Another worker's write never reaches this worker's invalidation.
+        with mock.patch.object(response_cache, 'invalidate'):
+            create_reading(sensor=sensor, timestamp=datetime(2017, 5, 30, 13))
+        with self.client:
+            response = self.client.get(url, headers=headers)
+        self.assertEqual(len(response.json), 2)
+
     def test_list_readings_for_another_user(self):
         user = create_user()
         home = create_home(timezone='PST8PDT')
@@ -66,6 +320,239 @@ class TestApiV1(TestCase):
             )
         self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
 
+    def test_list_readings_range(self):
+        home = create_home(timezone='UTC')
+        sensor = create_sensor(home=home)
+        start = datetime(2017, 5, 30)
+        for n in range(10):
+            create_reading(
+                sensor=sensor,
+                timestamp=start + timedelta(hours=n * 6),
+                ext_temp=float(n),
+            )
+        with self.client:
+            response = self.client.get(
+                url_for(
+                    'api_v1_list_readings_range',
+                    sensor_uuid=sensor.uuid,
+                    start='2017-05-30',
+                    end='2017-06-01',
+                    max_points=5,
+                ),
+                headers={
+                    'Authorization': home.user.api_key,
+                    'Accept': 'application/json',
+                },
+            )
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertEqual(response.json['count'], 10)
+        ext_temp = response.json['series']['ext_temp']
+        self.assertEqual(len(ext_temp), 5)
+        self.assertEqual(ext_temp[0], ['2017-05-30T00:00Z', 0.0])
+        self.assertEqual(ext_temp[-1], ['2017-06-01T06:00Z', 9.0])
+
+    def test_list_readings_range_keeps_spikes(self):
+        home = create_home(timezone='UTC')
+        sensor = create_sensor(home=home)
+        start = datetime(2017, 5, 1)
+        rows = [
+            dict(
+                sensor_id=sensor.id,
+                timestamp=start + timedelta(hours=n),
+                int_temp=50.0,
+                ext_temp=20.0,
+                humidity=60.0,
+                resistance=1500.0,
+            )
+            for n in range(30 * 24)
+        ]
+        rows[400]['ext_temp'] = 40.0
+        write_readings(rows)
+        db.session.commit()
+        with self.client:
+            response = self.client.get(
+                url_for(
+                    'api_v1_list_readings_range',
+                    sensor_uuid=sensor.uuid,
+                    start='2017-05-01',
+                    end='2017-05-30',
+                    max_points=10,
+                    fields='ext_temp',
+                ),
+                headers={
+                    'Authorization': home.user.api_key,
+                    'Accept': 'application/json',
+                },
+            )
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertEqual(response.json['count'], 720)
+        ext_temp = response.json['series']['ext_temp']
+        self.assertEqual(len(ext_temp), 10)
+        self.assertIn(['2017-05-17T16:00Z', 40.0], ext_temp)
+
+    def test_page_readings(self):
+        home = create_home(timezone='UTC')
+        sensor = create_sensor(home=home)
+        readings = [
+            create_reading(sensor=sensor, timestamp=datetime(2017, 5, 30, n))
+            for n in range(5)
+        ]
+        headers = {
+            'Authorization': home.user.api_key,
+            'Accept': 'application/json',
+        }
+        pages = []
+        cursor = None
+        with self.client:
+            while True:
+                response = self.client.get(
+                    url_for(
+                        'api_v1_page_readings',
+                        sensor_uuid=sensor.uuid,
+                        limit=2,
+                        cursor=cursor,
+                    ),
+                    headers=headers,
+                )
+                self.assertEqual(response.status_code, HTTPStatus.OK)
+                pages.append(response.json['readings'])
+                cursor = response.json['next_cursor']
+                if not cursor:
+                    break
+        self.assertEqual([len(page) for page in pages], [2, 2, 1])
+        self.assertEqual(
+            [reading for page in pages for reading in page],
+            [r.as_dict() for r in readings],
+        )
+        with self.client:
+            response = self.client.get(
+                url_for(
+                    'api_v1_page_readings',
+                    sensor_uuid=sensor.uuid,
+                    cursor='tampered',
+                ),
+                headers=headers,
+            )
+        self.assertEqual(response.status_code, HTTPStatus.BAD_REQUEST)
+
+    def test_readings_delta(self):
+        home = create_home(timezone='UTC')
+        sensor = create_sensor(home=home)
+        readings = [
+            create_reading(sensor=sensor, timestamp=datetime(2017, 5, 30, n))
+            for n in range(3)
+        ]
+        headers = {
+            'Authorization': home.user.api_key,
+            'Accept': 'application/json',
+        }
+        with self.client:
+            response = self.client.get(
+                url_for(
+                    'api_v1_readings_delta',
+                    sensor_uuid=sensor.uuid,
+                    since='2017-05-30T00:00:00Z',
+                ),
+                headers=headers,
+            )
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertEqual(
+            response.json['readings'],
+            [r.as_dict() for r in readings[1:]],
+        )
+        self.assertFalse(response.json['more'])
+        cursor = response.json['cursor']
+        with self.client:
+            response = self.client.get(
+                url_for(
+                    'api_v1_readings_delta',
+                    sensor_uuid=sensor.uuid,
+                    cursor=cursor,
+                ),
+                headers=headers,
+            )
+        self.assertEqual(response.status_code, HTTPStatus.NO_CONTENT)
+        self.assertEqual(response.data, b'')
+        latest = create_reading(sensor=sensor, timestamp=datetime(2017, 5, 30, 3))
+        with self.client:
+            response = self.client.get(
+                url_for(
+                    'api_v1_readings_delta',
+                    sensor_uuid=sensor.uuid,
+                    cursor=cursor,
+                ),
+                headers=headers,
+            )
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertEqual(response.json['readings'], [latest.as_dict()])
+        with self.client:
+            response = self.client.get(
+                url_for('api_v1_readings_delta', sensor_uuid=sensor.uuid),
+                headers=headers,
+            )
+        self.assertEqual(response.status_code, HTTPStatus.BAD_REQUEST)
+
+    def test_analytics(self):
+        home = create_home(timezone='UTC')
+        sensor = create_sensor(home=home)
+        for hour, ext_temp in ((0, 8.0), (12, 8.0), (24, 28.0)):
+            create_reading(
+                sensor=sensor,
+                timestamp=datetime(2017, 5, 30) + timedelta(hours=hour),
+                ext_temp=ext_temp,
+            )
+        with self.client:
+            response = self.client.get(
+                url_for(
+                    'api_v1_analytics',
+                    sensor_uuid=sensor.uuid,
+                    start='2017-05-30',
+                    end='2017-05-31',
+                    series='true',
+                ),
+                headers={
+                    'Authorization': home.user.api_key,
+                    'Accept': 'application/json',
+                },
+            )
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertEqual(response.json['count'], 3)
+        ext_temp = response.json['stats']['ext_temp']
+        self.assertEqual(ext_temp['max'], dict(value=28.0, timestamp='2017-05-31T00:00Z'))
+        self.assertEqual(response.json['degree_days']['heating'], 7.5)
+        self.assertEqual(response.json['series']['timestamp'], [0, 43200, 86400])
+
+    def test_list_daily_rollups(self):
+        home = create_home(timezone='UTC')
+        sensor = create_sensor(home=home)
+        for hour, ext_temp in ((1, 18.0), (13, 26.0)):
+            create_reading(
+                sensor=sensor,
+                timestamp=datetime(2017, 5, 30, hour),
+                ext_temp=ext_temp,
+            )
+        with self.client:
+            response = self.client.get(
+                url_for(
+                    'api_v1_list_daily_rollups',
+                    sensor_uuid=sensor.uuid,
+                    start='2017-05-01',
+                    end='2017-05-31',
+                ),
+                headers={
+                    'Authorization': home.user.api_key,
+                    'Accept': 'application/json',
+                },
+            )
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertEqual(len(response.json), 1)
+        self.assertEqual(response.json[0]['day'], '2017-05-30')
+        self.assertEqual(response.json[0]['count'], 2)
+        self.assertEqual(
+            response.json[0]['ext_temp'],
+            dict(min=18.0, max=26.0, mean=22.0),
+        )
+
     def test_create_reading(self):
         sensor = create_sensor()
         api_key = sensor.home.user.api_key
@@ -161,6 +648,186 @@ class TestApiV1(TestCase):
             {'error': 'A conflicting record already exists.'},
         )
 
+    def test_create_duplicate_reading_with_ignore_policy(self):
+        sensor = create_sensor()
+        api_key = sensor.home.user.api_key
+        payload = dict(
+            timestamp=datetime.utcnow().isoformat(),
+            int_temp=50.5,
+            ext_temp=21.0,
+            humidity=50.0,
+            resistance=1000.0,
+        )
+        create_reading(sensor=sensor, **payload)
+        with self.client:
+            response = self.client.post(
+                url_for(
+                    'api_v1_create_reading',
+                    sensor_uuid=sensor.uuid,
+                    on_conflict='ignore',
+                ),
+                headers={
+                    'Authorization': api_key,
+                    'Accept': 'application/json',
+                    'Content-Type': 'application/json'
+                },
+                data=json.dumps(payload),
+            )
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertDictEqual(response.json, {'status': 'Duplicate'})
+
+    def test_create_duplicate_reading_with_overwrite_policy(self):
+        sensor = create_sensor()
+        api_key = sensor.home.user.api_key
+        payload = dict(
+            timestamp=datetime.utcnow().isoformat(),
+            int_temp=50.5,
+            ext_temp=21.0,
+            humidity=50.0,
+            resistance=1000.0,
+        )
+        reading = create_reading(sensor=sensor, **payload)
+        payload['ext_temp'] = 22.5
+        with self.client:
+            response = self.client.post(
+                url_for(
+                    'api_v1_create_reading',
+                    sensor_uuid=sensor.uuid,
+                    on_conflict='overwrite',
+                ),
+                headers={
+                    'Authorization': api_key,
+                    'Accept': 'application/json',
+                    'Content-Type': 'application/json'
+                },
+                data=json.dumps(payload),
+            )
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertDictEqual(response.json, {'status': 'Updated'})
+        db.session.refresh(reading)
+        self.assertEqual(reading.ext_temp, 22.5)
+
+    def test_create_readings_from_ndjson_stream(self):
+        sensor = create_sensor()
+        api_key = sensor.home.user.api_key
+        now = datetime.utcnow().replace(microsecond=0)
+        lines = [
+            json.dumps(dict(
+                timestamp=(now + timedelta(minutes=n)).isoformat(),
+                ext_temp=21.0,
+                humidity=50.0,
+                resistance=1000.0,
+            ))
+            for n in range(3)
+        ]
+        lines.insert(1, '{not json')
+        with self.client:
+            response = self.client.post(
+                url_for('api_v1_create_reading', sensor_uuid=sensor.uuid),
+                headers={
+                    'Authorization': api_key,
+                    'Accept': 'application/json',
+                    'Content-Type': 'application/x-ndjson'
+                },
+                data='\n'.join(lines),
+            )
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertEqual(response.json['created'], 3)
+        self.assertEqual(
+            response.json['errors'],
+            [{'line': 2, 'error': 'line is not valid JSON'}],
+        )
+        self.assertEqual(sensor.readings.count(), 3)
+
+    def test_create_reading_with_write_behind(self):
+        sensor = create_sensor()
+        api_key = sensor.home.user.api_key
+        payload = dict(
+            timestamp=datetime.utcnow().isoformat(),
+            int_temp=50.5,
+            ext_temp=21.0,
+            humidity=50.0,
+            resistance=1000.0,
+        )
+        self.app.config['INGEST_WRITE_BEHIND'] = True
+        try:
+            with self.client:
+                response = self.client.post(
+                    url_for('api_v1_create_reading', sensor_uuid=sensor.uuid),
+                    headers={
+                        'Authorization': api_key,
+                        'Accept': 'application/json',
+                        'Content-Type': 'application/json'
+                    },
+                    data=json.dumps(payload),
+                )
+            ingest_buffer.stop()
+        finally:
+            self.app.config['INGEST_WRITE_BEHIND'] = False
+        self.assertEqual(response.status_code, HTTPStatus.ACCEPTED)
+        self.assertEqual(ingest_buffer.depth, 0)
+        self.assertEqual(sensor.readings.count(), 1)
+
+    def test_write_behind_drops_rows_after_retries(self):
+        sensor = create_sensor()
+        row = dict(sensor_id=sensor.id, timestamp=datetime.utcnow())
+        dropped = ingest_buffer.dropped
+        with mock.patch(
+            'therminator.ingest.write_readings',
+            side_effect=RuntimeError('database unavailable'),
+        ) as write:
+            ingest_buffer._flush([row])
+        self.assertEqual(write.call_count, self.app.config['INGEST_RETRY_ATTEMPTS'])
+        self.assertEqual(ingest_buffer.dropped, dropped + 1)
+
+    def test_write_behind_drops_only_bad_rows(self):
+        sensors = [create_sensor(), create_sensor()]
+        now = datetime.utcnow().replace(microsecond=0)
+        rows = [
+            dict(
+                sensor_id=sensor_id,
+                timestamp=now - timedelta(minutes=n),
+                int_temp=50.0,
+                ext_temp=21.0,
+                humidity=60.0,
+                resistance=1500.0,
+            )
+            for n, sensor_id in enumerate([
+                sensors[0].id,
+                sensors[1].id,
+                sensors[1].id + 1000,
+                sensors[0].id,
+                sensors[1].id,
+            ])
+        ]
+        dropped = ingest_buffer.dropped
+        ingest_buffer._flush(rows)
+        self.assertEqual(ingest_buffer.dropped, dropped + 1)
+        self.assertEqual(sensors[0].readings.count(), 2)
+        self.assertEqual(sensors[1].readings.count(), 2)
+
+    def test_ingest_status_requires_ops_token(self):
+        sensor = create_sensor()
+        with self.client:
+            response = self.client.get(
+                url_for('api_v1_ingest_status'),
+                headers={
+                    'Authorization': sensor.home.user.api_key,
+                    'Accept': 'application/json',
+                },
+            )
+        self.assertEqual(response.status_code, HTTPStatus.UNAUTHORIZED)
+        with self.client:
+            response = self.client.get(
+                url_for('api_v1_ingest_status'),
+                headers={
+                    'Authorization': 'Bearer ' + self.app.config['OPS_TOKEN'],
+                    'Accept': 'application/json',
+                },
+            )
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertIn('dropped', response.json)
+
     def test_create_reading_without_authorization_header(self):
         sensor = create_sensor()
         payload = dict(
@@ -181,6 +848,35 @@ class TestApiV1(TestCase):
             )
         self.assertEqual(response.status_code, HTTPStatus.UNAUTHORIZED)
 
+    def test_api_key_change_expires_cached_user(self):
+        sensor = create_sensor()
+        user = sensor.home.user
+        api_key = user.api_key
+        url = url_for(
+            'api_v1_list_readings',
+            sensor_uuid=sensor.uuid,
+            date=date(2017, 5, 30),
+        )
+        headers = {'Authorization': api_key, 'Accept': 'application/json'}
+        with self.client:
+            response = self.client.get(url, headers=headers)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        user.api_key = 'deadbeef'
+        db.session.commit()
+        with self.client:
+            response = self.client.get(url, headers=headers)
+        self.assertEqual(response.status_code, HTTPStatus.UNAUTHORIZED)
+
+    def test_api_key_does_not_sign_in_html_views(self):
+        sensor = create_sensor()
+        with self.client:
+            response = self.client.get(
+                url_for('list_homes'),
+                headers={'Authorization': sensor.home.user.api_key},
+            )
+        self.assertEqual(response.status_code, HTTPStatus.FOUND)
+        self.assertIn(url_for('sign_in'), response.location)
+
     def test_create_reading_for_another_user(self):
         user = create_user()
         sensor = create_sensor()
@@ -203,5 +899,99 @@ class TestApiV1(TestCase):
             )
         self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
 
+    def test_create_readings_in_batch(self):
+        sensor = create_sensor()
+        api_key = sensor.home.user.api_key
+        now = datetime.utcnow().replace(microsecond=0)
+        existing = create_reading(sensor=sensor, timestamp=now)
+        payload = [
+            dict(
+                timestamp=(now + timedelta(minutes=1)).isoformat(),
+                int_temp=50.5,
+                ext_temp=21.0,
+                humidity=50.0,
+                resistance=1000.0,
+            ),
+            dict(timestamp=now.isoformat(), ext_temp=21.0, humidity=50.0, resistance=1000.0),
+            dict(timestamp=now.isoformat(), ext_temp=21.0, humidity=-1.0, resistance=1000.0),
+        ]
+        with self.client:
+            response = self.client.post(
+                url_for('api_v1_create_readings', sensor_uuid=sensor.uuid),
+                headers={
+                    'Authorization': api_key,
+                    'Accept': 'application/json',
+                    'Content-Type': 'application/json'
+                },
+                data=json.dumps(payload),
+            )
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertEqual(sensor.readings.count(), 2)
+        self.assertEqual(
+            response.json['results'],
+            [
+                {'index': 0, 'status': 'created'},
+                {'index': 1, 'status': 'duplicate'},
+                {
+                    'index': 2,
+                    'status': 'invalid',
+                    'error': 'humidity must be between 0 and 100',
+                },
+            ],
+        )
+
+    def test_create_readings_in_batch_requires_array(self):
+        sensor = create_sensor()
+        api_key = sensor.home.user.api_key
+        with self.client:
+            response = self.client.post(
+                url_for('api_v1_create_readings', sensor_uuid=sensor.uuid),
+                headers={
+                    'Authorization': api_key,
+                    'Accept': 'application/json',
+                    'Content-Type': 'application/json'
+                },
+                data=json.dumps({}),
+            )
+        self.assertEqual(response.status_code, HTTPStatus.BAD_REQUEST)
+
+    def test_resolve_sensor_after_timezone_change(self):
+        sensor = create_sensor()
+        home = sensor.home
+        ref = resolve_sensor(sensor.uuid, home.user.id)
+        self.assertEqual(ref, (sensor.id, home.id, 'PST8PDT'))
+        home.timezone = 'UTC'
+        db.session.commit()
+        ref = resolve_sensor(sensor.uuid, home.user.id)
+        self.assertEqual(ref.timezone, 'UTC')
+
+    def test_create_reading_for_sensor_deleted_elsewhere(self):
+        sensor = create_sensor()
+        user = sensor.home.user
+        resolve_sensor(sensor.uuid, user.id)
+        # A raw delete skips the mapper events, like a write in another worker.
+        db.session.execute(
+            'DELETE FROM sensors WHERE id = :id',
+            {'id': sensor.id},
+        )
+        db.session.commit()
+        with self.client:
+            response = self.client.post(
+                url_for('api_v1_create_reading', sensor_uuid=sensor.uuid),
+                headers={
+                    'Authorization': user.api_key,
+                    'Accept': 'application/json',
+                    'Content-Type': 'application/json'
+                },
+                data=json.dumps(dict(
+                    timestamp=datetime.utcnow().isoformat(),
+                    ext_temp=21.0,
+                    humidity=50.0,
+                    resistance=1000.0,
+                )),
+            )
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+        self.assertIsNone(sensor_cache.get((sensor.uuid, user.id)))
+
 if __name__ == '__main__':
     unittest.main()
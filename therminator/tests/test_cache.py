@@ -0,0 +1,44 @@
+import unittest
+from unittest import mock
+from base import TestCase
+from therminator.cache import LRUCache
+
+class TestLRUCache(TestCase):
+    def test_evicts_least_recently_used(self):
+        cache = LRUCache(2)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        self.assertEqual(cache.get('a'), 1)
+        cache.set('c', 3)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('c'), 3)
+        self.assertEqual(
+            cache.stats(),
+            dict(size=2, weight=2, maxsize=2, hits=2, misses=1, evictions=1),
+        )
+
+    def test_expires_entries(self):
+        cache = LRUCache(2, ttl=60)
+        with mock.patch('therminator.cache.time.monotonic', return_value=0):
+            cache.set('a', 1)
+        with mock.patch('therminator.cache.time.monotonic', return_value=61):
+            self.assertIsNone(cache.get('a'))
+
+    def test_evicts_by_weight(self):
+        cache = LRUCache(10, weigher=len)
+        cache.set('a', b'12345')
+        cache.set('b', b'12345')
+        cache.set('c', b'123')
+        self.assertIsNone(cache.get('a'))
+        self.assertEqual(cache.weight, 8)
+
+    def test_discard_where(self):
+        cache = LRUCache(3)
+        for n in range(3):
+            cache.set(n, n)
+        cache.discard_where(lambda key, value: value % 2 == 0)
+        self.assertEqual(len(cache), 1)
+        self.assertEqual(cache.get(1), 1)
+
+if __name__ == '__main__':
+    unittest.main()
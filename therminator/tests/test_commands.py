@@ -0,0 +1,79 @@
+import unittest
+from click.testing import CliRunner
+import csv
+from datetime import datetime
+from flask.cli import ScriptInfo
+import os
+import tempfile
+from base import TestCase
+from factories import create_reading, create_sensor
+from therminator.commands import import_readings, parse_file
+from therminator.models import Reading
+
+class TestImportReadings(TestCase):
+    def test_parse_file(self):
+        fd, path = tempfile.mkstemp(suffix='.csv')
+        with os.fdopen(fd, 'w') as f:
+            f.write('timestamp,int_temp,ext_temp,humidity,resistance\n')
+            f.write('2017-05-30T23:30:00Z,,21.0,50.0,1000.0\n')
+            f.write('2017-05-30T23:31:00Z,,21.0,101.0,1000.0\n')
+        try:
+            copy_path, count, rejects = parse_file(path, 'csv')
+            with open(copy_path) as f:
+                rows = list(csv.reader(f))
+            os.remove(copy_path)
+        finally:
+            os.remove(path)
+        self.assertEqual(count, 1)
+        self.assertEqual(
+            rows,
+            [['2017-05-30 23:30:00', '0.0', '21.0', '50.0', '1000.0']],
+        )
+        self.assertEqual(rejects, [(3, 'humidity must be between 0 and 100')])
+
+    def test_import_readings(self):
+        sensor = create_sensor()
+        create_reading(
+            sensor=sensor,
+            timestamp=datetime(2017, 5, 30, 23, 30),
+            ext_temp=18.0,
+        )
+        fd, path = tempfile.mkstemp(suffix='.csv')
+        with os.fdopen(fd, 'w') as f:
+            f.write('timestamp,int_temp,ext_temp,humidity,resistance\n')
+            f.write('2017-05-30T23:30:00Z,,21.0,50.0,1000.0\n')
+            f.write('2017-05-30T23:31:00Z,,21.0,50.0,1000.0\n')
+            f.write('2017-05-30T23:32:00Z,,21.0,101.0,1000.0\n')
+        runner = CliRunner()
+        obj = ScriptInfo(create_app=lambda info: self.app)
+        try:
+            result = runner.invoke(
+                import_readings,
+                ['--sensor', sensor.uuid, '--workers', '1', path],
+                obj=obj,
+            )
+            self.assertEqual(result.exit_code, 0, result.output)
+            self.assertIn(
+                'Imported 1 of 2 rows (1 rejected, 1 conflicting)',
+                result.output,
+            )
+            self.assertEqual(
+                Reading.query.filter_by(sensor_id=sensor.id).count(),
+                2,
+            )
+            result = runner.invoke(
+                import_readings,
+                ['--sensor', sensor.uuid, '--workers', '1',
+                 '--on-conflict', 'overwrite', path],
+                obj=obj,
+            )
+            self.assertEqual(result.exit_code, 0, result.output)
+            self.assertIn('Imported 2 of 2 rows', result.output)
+        finally:
+            os.remove(path)
+        ext_temps = Reading.query.filter_by(sensor_id=sensor.id) \
+            .order_by(Reading.timestamp).with_entities(Reading.ext_temp).all()
+        self.assertEqual(ext_temps, [(21.0,), (21.0,)])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,24 @@
+import unittest
+from datetime import datetime
+from base import TestCase
+from therminator.dates import format_local_times, get_timezone
+
+class TestDates(TestCase):
+    def test_format_local_times(self):
+        tz = get_timezone('PST8PDT')
+        times = [datetime(2017, 5, 30, 7), datetime(2017, 5, 30, 19, 30)]
+        self.assertEqual(
+            format_local_times(times, tz, '%H:%M %Z'),
+            ['00:00 PDT', '12:30 PDT'],
+        )
+
+    def test_format_local_times_across_dst_change(self):
+        tz = get_timezone('PST8PDT')
+        times = [datetime(2017, 11, 5, 8, 30), datetime(2017, 11, 5, 9, 30)]
+        self.assertEqual(
+            format_local_times(times, tz, '%H:%M %Z'),
+            ['01:30 PDT', '01:30 PST'],
+        )
+
+if __name__ == '__main__':
+    unittest.main()
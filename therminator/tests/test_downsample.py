@@ -0,0 +1,20 @@
+import unittest
+from base import TestCase
+from therminator.downsample import lttb
+
+class TestLTTB(TestCase):
+    def test_returns_short_series_unchanged(self):
+        points = [(x, x) for x in range(5)]
+        self.assertEqual(lttb(points, 10), points)
+
+    def test_keeps_endpoints_and_peaks(self):
+        points = [(x, 0.0) for x in range(100)]
+        points[37] = (37, 10.0)
+        sampled = lttb(points, 10)
+        self.assertEqual(len(sampled), 10)
+        self.assertEqual(sampled[0], points[0])
+        self.assertEqual(sampled[-1], points[-1])
+        self.assertIn((37, 10.0), sampled)
+
+if __name__ == '__main__':
+    unittest.main()
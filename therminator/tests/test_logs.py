@@ -0,0 +1,47 @@
+import unittest
+from unittest import mock
+from flask import json, url_for
+import logging
+from base import TestCase
+from therminator.logs import JsonFormatter, SummaryLog
+
+class TestLogs(TestCase):
+    def test_json_formatter(self):
+        record = logging.LogRecord(
+            'therminator.sql', logging.WARNING, __file__, 1,
+            'Slow query took %dms', (300,), None,
+        )
+        record.request_id = 'abc123'
+        record.data = dict(duration_ms=300)
+        entry = json.loads(JsonFormatter().format(record))
+        self.assertEqual(entry['message'], 'Slow query took 300ms')
+        self.assertEqual(entry['request_id'], 'abc123')
+        self.assertEqual(entry['duration_ms'], 300)
+
+    def test_summary_log_emits_once_per_interval(self):
+        with mock.patch('therminator.logs.time.monotonic', return_value=0):
+            summary = SummaryLog('Readings', 60)
+        with mock.patch('therminator.logs.summary_logger') as logger, \
+                mock.patch('therminator.logs.time.monotonic') as monotonic:
+            monotonic.return_value = 10
+            summary.count('created')
+            summary.count('created')
+            self.assertFalse(logger.info.called)
+            monotonic.return_value = 61
+            summary.count('invalid')
+            args, kwargs = logger.info.call_args
+        self.assertEqual(
+            kwargs['extra']['data']['counts'],
+            {'created': 2, 'invalid': 1},
+        )
+
+    def test_request_id_is_echoed(self):
+        with self.client:
+            response = self.client.get(
+                url_for('sign_in'),
+                headers={'X-Request-ID': 'req-1'},
+            )
+        self.assertEqual(response.headers['X-Request-ID'], 'req-1')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,43 @@
+import unittest
+from flask import json, url_for
+from http import HTTPStatus
+from base import TestCase
+from factories import create_home, create_sensor
+
+class TestMetrics(TestCase):
+    def test_metrics(self):
+        home = create_home(timezone='UTC')
+        sensor = create_sensor(home=home)
+        with self.client:
+            response = self.client.post(
+                url_for('api_v1_create_reading', sensor_uuid=sensor.uuid),
+                data=json.dumps({'timestamp': '2017-05-30T12:00:00Z'}),
+                headers={
+                    'Authorization': home.user.api_key,
+                    'Content-Type': 'application/json',
+                    'Accept': 'application/json',
+                },
+            )
+        self.assertEqual(response.status_code, HTTPStatus.UNPROCESSABLE_ENTITY)
+        with self.client:
+            response = self.client.get(url_for('metrics'))
+        self.assertEqual(response.status_code, HTTPStatus.UNAUTHORIZED)
+        with self.client:
+            response = self.client.get(
+                url_for('metrics'),
+                headers={
+                    'Authorization': 'Bearer ' + self.app.config['METRICS_TOKEN'],
+                },
+            )
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        body = response.data.decode()
+        self.assertIn('therminator_readings_total{outcome="invalid"}', body)
+        self.assertIn('therminator_auth_total{method="api_key",outcome="success"}', body)
+        self.assertIn(
+            'therminator_request_duration_seconds_count'
+            '{endpoint="api_v1_create_reading",method="POST"}',
+            body,
+        )
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,82 @@
+import unittest
+from datetime import date, datetime
+from base import TestCase
+from factories import create_reading, create_sensor
+from therminator import db
+from therminator.ingest import validate_reading, write_readings
+from therminator.partitions import (
+    create_upcoming_partitions,
+    known_partitions,
+    months_between,
+)
+
+PARTITIONS = '''
+SELECT child.relname
+FROM pg_inherits
+JOIN pg_class parent ON parent.oid = pg_inherits.inhparent
+JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+WHERE parent.relname = 'readings'
+'''
+
+class TestPartitions(TestCase):
+    def partitions(self):
+        return {row[0] for row in db.session.execute(PARTITIONS)}
+
+    def test_months_between(self):
+        self.assertEqual(
+            list(months_between(datetime(2016, 11, 30), datetime(2017, 1, 1))),
+            [date(2016, 11, 1), date(2016, 12, 1), date(2017, 1, 1)],
+        )
+
+    def test_create_upcoming_partitions(self):
+        names = create_upcoming_partitions(db.session, 2, today=date(2017, 12, 5))
+        self.assertEqual(
+            names,
+            ['readings_y2017m12', 'readings_y2018m01', 'readings_y2018m02'],
+        )
+        self.assertTrue(set(names) <= self.partitions())
+
+    def test_readings_create_partitions(self):
+        sensor = create_sensor()
+        create_reading(sensor=sensor, timestamp=datetime(2010, 1, 15))
+        write_readings([dict(
+            sensor_id=sensor.id,
+            timestamp=datetime(2011, 3, 31, 23, 59),
+            int_temp=0.0,
+            ext_temp=20.0,
+            humidity=50.0,
+            resistance=1500.0,
+        )])
+        db.session.commit()
+        self.assertTrue(
+            {'readings_y2010m01', 'readings_y2011m03'} <= self.partitions(),
+        )
+
+    def test_ingest_creates_partitions_in_their_own_transaction(self):
+        sensor = create_sensor()
+        write_readings([dict(
+            sensor_id=sensor.id,
+            timestamp=datetime(2012, 7, 4),
+            int_temp=0.0,
+            ext_temp=20.0,
+            humidity=50.0,
+            resistance=1500.0,
+        )])
+        db.session.rollback()
+        self.assertIn('readings_y2012m07', self.partitions())
+        self.assertIn(date(2012, 7, 1), known_partitions)
+
+    def test_timestamps_outside_the_window_are_rejected(self):
+        reading = dict(ext_temp=20.0, humidity=50.0, resistance=1500.0)
+        with self.assertRaisesRegex(ValueError, 'in the future'):
+            validate_reading(dict(reading, timestamp='2099-01-01T00:00:00Z'))
+        self.app.config['READING_MAX_AGE'] = 366 * 86400
+        try:
+            with self.assertRaisesRegex(ValueError, 'within the last 366 days'):
+                validate_reading(dict(reading, timestamp='1970-01-01T00:00:00Z'))
+        finally:
+            self.app.config['READING_MAX_AGE'] = None
+        self.assertNotIn('readings_y2099m01', self.partitions())
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,91 @@
+import unittest
+from unittest import mock
+from flask import url_for
+from http import HTTPStatus
+from base import TestCase
+from factories import build_user, create_user
+from therminator import db
+from therminator.passwords import (
+    PASSWORD_LOCK,
+    Throttle,
+    Throttled,
+    account_throttle,
+)
+
+class TestThrottle(TestCase):
+    def setUp(self):
+        super().setUp()
+        self.app.config['WTF_CSRF_ENABLED'] = False
+
+    def tearDown(self):
+        self.app.config['WTF_CSRF_ENABLED'] = True
+        super().tearDown()
+
+    def test_limits_attempts_per_key(self):
+        throttle = Throttle(limit=2, period=60)
+        self.assertTrue(throttle.hit('alice@example.com'))
+        self.assertTrue(throttle.hit('alice@example.com'))
+        self.assertFalse(throttle.hit('alice@example.com'))
+        self.assertTrue(throttle.hit('bob@example.com'))
+
+    def test_sign_in_is_throttled(self):
+        user = create_user(password='secret')
+        with mock.patch.object(account_throttle, 'limit', 0):
+            with self.client:
+                response = self.client.post(
+                    url_for('sign_in'),
+                    data=dict(email=user.email, password='secret'),
+                )
+        self.assertEqual(response.status_code, HTTPStatus.TOO_MANY_REQUESTS)
+        self.assertIn(b'Too many sign in attempts', response.data)
+
+    def test_refresh_session_is_throttled(self):
+        user = create_user(password='secret')
+        with self.client:
+            response = self.client.post(
+                url_for('sign_in'),
+                data=dict(email=user.email, password='secret'),
+            )
+            self.assertEqual(response.status_code, HTTPStatus.FOUND)
+            with mock.patch.object(account_throttle, 'limit', 0):
+                response = self.client.post(
+                    url_for('refresh_session'),
+                    data=dict(password='secret'),
+                )
+        self.assertEqual(response.status_code, HTTPStatus.TOO_MANY_REQUESTS)
+        self.assertIn(b'Too many sign in attempts', response.data)
+
+    def hold_password_slots(self):
+        connection = db.engine.connect()
+        for slot in range(self.app.config['PASSWORD_HASH_SLOTS']):
+            connection.execute(
+                'SELECT pg_advisory_lock({}, {})'.format(PASSWORD_LOCK, slot)
+            )
+        return connection
+
+    def test_sign_in_is_refused_while_password_slots_are_busy(self):
+        user = create_user(password='secret')
+        connection = self.hold_password_slots()
+        try:
+            with self.client:
+                response = self.client.post(
+                    url_for('sign_in'),
+                    data=dict(email=user.email, password='secret'),
+                )
+        finally:
+            connection.close()
+        self.assertEqual(response.status_code, HTTPStatus.TOO_MANY_REQUESTS)
+        self.assertIn(b'The server is busy', response.data)
+
+    def test_password_hashing_is_refused_while_slots_are_busy(self):
+        connection = self.hold_password_slots()
+        try:
+            with self.assertRaises(Throttled):
+                build_user(password='secret')
+        finally:
+            connection.close()
+        db.session.rollback()
+        self.assertTrue(build_user(password='secret').is_correct_password('secret'))
+
+if __name__ == '__main__':
+    unittest.main()
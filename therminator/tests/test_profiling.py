@@ -0,0 +1,70 @@
+import unittest
+from datetime import date
+from flask import url_for
+from http import HTTPStatus
+from base import TestCase
+from factories import create_home, create_sensor
+from therminator import app
+from therminator.profiling import Histogram, QueryBudgetExceeded, query_stats
+
+class TestProfiling(TestCase):
+    def test_histogram(self):
+        histogram = Histogram((1, 5))
+        for value in (0, 1, 3, 10):
+            histogram.observe(value)
+        self.assertEqual(
+            histogram.as_dict(),
+            dict(count=4, sum=14, buckets=[[1, 2], [5, 1], ['+Inf', 1]]),
+        )
+
+    def test_server_timing(self):
+        home = create_home(timezone='UTC')
+        sensor = create_sensor(home=home)
+        with self.client:
+            response = self.client.get(
+                url_for(
+                    'api_v1_list_readings',
+                    sensor_uuid=sensor.uuid,
+                    date=date(2017, 5, 30),
+                ),
+                headers={
+                    'Authorization': home.user.api_key,
+                    'Accept': 'application/json',
+                },
+            )
+        self.assertRegex(
+            response.headers['Server-Timing'],
+            r'^db;dur=[\d.]+;desc="\d+ queries", app;dur=[\d.]+$',
+        )
+        self.assertIn('api_v1_list_readings', query_stats())
+
+    def test_query_budget_exceeded(self):
+        budgets = app.config['QUERY_BUDGETS']
+        app.config['QUERY_BUDGETS'] = dict(budgets, api_v1_ingest_status=0)
+        try:
+            with self.assertRaises(QueryBudgetExceeded):
+                with self.client:
+                    self.client.get(
+                        url_for('api_v1_ingest_status'),
+                        headers={
+                            'Authorization': 'Bearer ' + app.config['OPS_TOKEN'],
+                            'Accept': 'application/json',
+                        },
+                    )
+        finally:
+            app.config['QUERY_BUDGETS'] = budgets
+
+    def test_query_stats_require_ops_token(self):
+        home = create_home(timezone='UTC')
+        with self.client:
+            response = self.client.get(
+                url_for('api_v1_query_stats'),
+                headers={
+                    'Authorization': home.user.api_key,
+                    'Accept': 'application/json',
+                },
+            )
+        self.assertEqual(response.status_code, HTTPStatus.UNAUTHORIZED)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -28,7 +28,9 @@ class TestReading(TestCase):
         self.assertEqual(cm.exception.args, ("timestamp can't be blank",))
 
     def test_validate_int_temp(self):
-        pass
+        with self.assertRaises(ValueError) as cm:
+            build_reading(int_temp='warm')
+        self.assertEqual(cm.exception.args, ('int_temp must be a number',))
 
     def test_validate_ext_temp(self):
         with self.assertRaises(ValueError) as cm:
@@ -51,6 +53,16 @@ class TestReading(TestCase):
             ('humidity must be between 0 and 100',)
         )
 
+    def test_validate_timestamp_parses_strings(self):
+        reading = build_reading(timestamp='2017-05-30T23:30:00-07:00')
+        self.assertEqual(reading.timestamp, datetime(2017, 5, 31, 6, 30))
+        with self.assertRaises(ValueError) as cm:
+            build_reading(timestamp='yesterday-ish')
+        self.assertEqual(
+            cm.exception.args,
+            ('timestamp must be an ISO 8601 date and time',),
+        )
+
     def test_validate_resistance(self):
         reading = build_reading(resistance=-1.0)
         self.assertEqual(0.0, reading.resistance)
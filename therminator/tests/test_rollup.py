@@ -0,0 +1,92 @@
+import unittest
+from datetime import date, datetime, timedelta
+from base import TestCase
+from factories import create_home, create_sensor, create_reading
+from therminator import db
+from therminator.models import DailyRollup, HourlyRollup, Reading, Sensor
+from therminator.rollups import refresh_latest_readings
+
+class TestRollup(TestCase):
+    def test_readings_update_rollups(self):
+        home = create_home(timezone='PST8PDT')
+        sensor = create_sensor(home=home)
+        # 06:30 and 07:10 UTC fall on May 29 and May 30 in Pacific time.
+        create_reading(sensor=sensor, timestamp=datetime(2017, 5, 30, 6, 30), ext_temp=20.0)
+        create_reading(sensor=sensor, timestamp=datetime(2017, 5, 30, 7, 10), ext_temp=22.0)
+        create_reading(sensor=sensor, timestamp=datetime(2017, 5, 30, 7, 40), ext_temp=24.0)
+        days = DailyRollup.query.filter_by(sensor_id=sensor.id) \
+            .order_by(DailyRollup.day).all()
+        self.assertEqual(
+            [(d.day, d.count) for d in days],
+            [(date(2017, 5, 29), 1), (date(2017, 5, 30), 2)],
+        )
+        self.assertEqual(
+            days[1].summary('ext_temp'),
+            dict(min=22.0, max=24.0, mean=23.0),
+        )
+        hour = HourlyRollup.query.filter_by(
+            sensor_id=sensor.id,
+            hour=datetime(2017, 5, 30, 7),
+        ).one()
+        self.assertEqual(hour.count, 2)
+
+    def test_moved_reading_leaves_its_old_buckets(self):
+        home = create_home(timezone='UTC')
+        sensor = create_sensor(home=home)
+        create_reading(sensor=sensor, timestamp=datetime(2017, 5, 30, 7), ext_temp=20.0)
+        reading = create_reading(
+            sensor=sensor,
+            timestamp=datetime(2017, 5, 30, 7, 30),
+            ext_temp=30.0,
+        )
+        reading.timestamp = datetime(2017, 5, 31, 8)
+        db.session.commit()
+        hours = HourlyRollup.query.filter_by(sensor_id=sensor.id) \
+            .order_by(HourlyRollup.hour).all()
+        self.assertEqual(
+            [(h.hour, h.count, h.ext_temp_max) for h in hours],
+            [
+                (datetime(2017, 5, 30, 7), 1, 20.0),
+                (datetime(2017, 5, 31, 8), 1, 30.0),
+            ],
+        )
+        days = DailyRollup.query.filter_by(sensor_id=sensor.id) \
+            .order_by(DailyRollup.day).all()
+        self.assertEqual(
+            [(d.day, d.count) for d in days],
+            [(date(2017, 5, 30), 1), (date(2017, 5, 31), 1)],
+        )
+
+    def test_concurrent_writers_refresh_latest_reading(self):
+        sensor = create_sensor()
+        now = datetime.utcnow().replace(microsecond=0)
+        first, second = db.engine.connect(), db.engine.connect()
+        try:
+            transactions = []
+            # Both INSERTs hold KEY SHARE on the sensor row before either
+            # writer refreshes latest_reading_id.
+            for connection, minutes in [(first, 2), (second, 1)]:
+                transactions.append(connection.begin())
+                connection.execute('SET LOCAL lock_timeout = 2000')
+                connection.execute(Reading.__table__.insert().values(
+                    sensor_id=sensor.id,
+                    timestamp=now - timedelta(minutes=minutes),
+                    int_temp=50.0,
+                    ext_temp=21.0,
+                    humidity=60.0,
+                    resistance=1500.0,
+                ))
+            refresh_latest_readings(first, [sensor.id])
+            transactions[0].commit()
+            refresh_latest_readings(second, [sensor.id])
+            transactions[1].commit()
+        finally:
+            first.close()
+            second.close()
+        db.session.expire_all()
+        latest = Sensor.query.get(sensor.id).latest
+        self.assertEqual(latest.timestamp, now - timedelta(minutes=1))
+        self.assertEqual(Reading.query.filter_by(sensor_id=sensor.id).count(), 2)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -3,8 +3,15 @@ from datetime import datetime, timedelta
 from sqlalchemy.exc import IntegrityError
 import uuid
 from base import TestCase
-from factories import build_home, build_sensor, create_sensor, build_reading
+from factories import (
+    build_home,
+    build_sensor,
+    create_sensor,
+    build_reading,
+    create_reading,
+)
 from therminator import db
+from therminator.ingest import write_readings
 from therminator.models import Sensor
 
 class TestSensor(TestCase):
@@ -34,5 +41,25 @@ class TestSensor(TestCase):
         db.session.commit()
         self.assertEqual(sensor.latest_reading(), readings[0])
 
+    def test_latest_reading_ignores_older_ingest(self):
+        now = datetime.utcnow()
+        sensor = create_sensor()
+        latest = create_reading(sensor=sensor, timestamp=now)
+        write_readings([dict(
+            sensor_id=sensor.id,
+            timestamp=now - timedelta(hours=2),
+            int_temp=0.0,
+            ext_temp=20.0,
+            humidity=50.0,
+            resistance=1500.0,
+        )])
+        db.session.commit()
+        self.assertEqual(sensor.latest, latest)
+        self.assertEqual(sensor.status(), 'online')
+        self.assertEqual(sensor.status(now + timedelta(hours=2)), 'offline')
+
+    def test_status_without_readings(self):
+        self.assertEqual(create_sensor().status(), 'no data')
+
 if __name__ == '__main__':
     unittest.main()
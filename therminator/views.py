@@ -1,4 +1,5 @@
-from datetime import datetime, time, timedelta
+from collections import namedtuple
+from datetime import datetime, timedelta
 from flask import flash, redirect, render_template, request, url_for
 from flask_login import (
     confirm_login,
@@ -8,13 +9,18 @@ from flask_login import (
     login_user,
     logout_user,
 )
-import pytz
+from http import HTTPStatus
 from sqlalchemy.exc import IntegrityError
 from urllib.parse import urljoin, urlparse
 
 from . import app, db, login_manager
+from .api.cursors import encode_cursor
+from .api.formats import columnar
+from .dates import day_bounds, format_local_times, get_timezone, localize
 from .forms import SignInForm, RefreshSessionForm, SensorForm
+from .metrics import count_auth
 from .models import User, Home, Sensor, Reading
+from .passwords import Throttled, throttle_sign_in
 
 @login_manager.user_loader
 def load_user(user_id):
@@ -34,9 +40,7 @@ def expose_utcnow():
 
 @app.template_filter('localtime')
 def localtime(timestamp, timezone, fmt='%Y-%m-%d %H:%M %Z'):
-    tz = pytz.timezone(timezone)
-    local = pytz.utc.localize(timestamp, is_dst=None).astimezone(tz)
-    return local.strftime(fmt)
+    return localize(timestamp, get_timezone(timezone)).strftime(fmt)
 
 @app.template_filter('numerify')
 def numerify(number, prec=1):
@@ -47,15 +51,28 @@ def sign_in():
     form = SignInForm()
     target = get_redirect_target()
     if form.validate_on_submit():
-        user = User.query.filter_by(email=form.email.data).first()
-        if user and user.is_correct_password(form.password.data):
-            app.logger.info('User {!r} signed in'.format(user.email))
-            login_user(user, remember=form.remember.data)
-            flash('You have successfully signed in.', 'success')
-            return redirect_back('list_homes')
-        else:
-            app.logger.warning('User {!r} failed to sign in'.format(form.email.data))
-            flash('Invalid email address or password.', 'danger')
+        try:
+            throttle_sign_in(form.email.data, remote_address())
+            user = User.query.filter_by(email=form.email.data).first()
+            if user and user.is_correct_password(form.password.data):
+                app.logger.info('User {!r} signed in'.format(user.email))
+                count_auth('password', 'success')
+                login_user(user, remember=form.remember.data)
+                flash('You have successfully signed in.', 'success')
+                return redirect_back('list_homes')
+            else:
+                app.logger.warning('User {!r} failed to sign in'.format(form.email.data))
+                count_auth('password', 'failure')
+                flash('Invalid email address or password.', 'danger')
+        except Throttled as e:
+            app.logger.warning('User {!r} throttled: {}'.format(form.email.data, e))
+            count_auth('password', 'throttled')
+            flash(e.args[0], 'danger')
+            return render_template(
+                'sign_in.html',
+                form=form,
+                target=target,
+            ), HTTPStatus.TOO_MANY_REQUESTS
     return render_template('sign_in.html', form=form, target=target)
 
 @app.route('/sign-out', methods=['GET', 'DELETE'])
@@ -70,45 +87,74 @@ def refresh_session():
     form = RefreshSessionForm()
     target = get_redirect_target()
     if form.validate_on_submit():
-        if current_user.is_correct_password(form.password.data):
-            confirm_login()
-            flash('You have successfully reauthenticated.', 'success')
-            return redirect_back('list_homes')
-        else:
-            flash('Invalid password.', 'danger')
+        try:
+            throttle_sign_in(current_user.email, remote_address())
+            if current_user.is_correct_password(form.password.data):
+                confirm_login()
+                flash('You have successfully reauthenticated.', 'success')
+                return redirect_back('list_homes')
+            else:
+                flash('Invalid password.', 'danger')
+        except Throttled as e:
+            flash(e.args[0], 'danger')
+            return render_template(
+                'refresh_session.html',
+                form=form,
+                target=target,
+            ), HTTPStatus.TOO_MANY_REQUESTS
     return render_template('refresh_session.html', form=form, target=target)
 
 @app.route('/')
 @login_required
 def list_homes():
-    return render_template('homes/index.html', homes=current_user.homes)
+    sensors = {}
+    for sensor in dashboard_sensors(Home.user_id == current_user.id):
+        sensors.setdefault(sensor.home_id, []).append(sensor)
+    return render_template(
+        'homes/index.html',
+        homes=current_user.homes,
+        sensors=sensors,
+    )
 
 @app.route('/homes/<int:home_id>')
 @login_required
 def show_home(home_id):
     home = current_user.homes.filter_by(id=home_id).first_or_404()
-    return render_template('homes/show.html', home=home)
+    sensors = dashboard_sensors(Sensor.home_id == home.id)
+    return render_template('homes/show.html', home=home, sensors=sensors)
 
 @app.route('/sensors/<int:sensor_id>', defaults={'date': None})
 @app.route('/sensors/<int:sensor_id>/<date:date>')
 @login_required
 def show_sensor(sensor_id, date):
     sensor = db.session.query(Sensor).filter_by(id=sensor_id) \
+        .options(db.joinedload(Sensor.latest)) \
         .join(Home).filter_by(user_id=current_user.id).first_or_404()
-    timezone = pytz.timezone(sensor.home.timezone)
+    timezone = get_timezone(sensor.home.timezone)
     if not date:
         date = datetime.now(timezone).date()
-    midnight = timezone.localize(datetime.combine(date, time())) \
-        .astimezone(pytz.utc).replace(tzinfo=None)
-    readings = sensor.readings.filter(Reading.timestamp.between(
-        midnight,
-        midnight + timedelta(days=1),
-    )).order_by(Reading.timestamp)
+    lower, upper = day_bounds(date, timezone)
+    rows = db.session.query(
+        Reading.timestamp,
+        Reading.int_temp,
+        Reading.ext_temp,
+        Reading.humidity,
+        Reading.resistance,
+    ).filter(Reading.sensor_id == sensor.id) \
+        .filter(Reading.timestamp.between(lower, upper)) \
+        .order_by(Reading.timestamp).all()
+    # Only today's chart can still grow, so only it polls for new readings.
+    delta_cursor = None
+    if date == datetime.now(timezone).date():
+        since = rows[-1].timestamp if rows else lower - timedelta(microseconds=1)
+        delta_cursor = encode_cursor(sensor.id, since)
     return render_template(
         'sensors/show.html',
         current_sensor=sensor,
         home=sensor.home,
-        readings=readings,
+        readings=reading_rows(rows, timezone),
+        chart=columnar(rows) if app.config['EMBED_CHART_DATA'] else None,
+        delta_cursor=delta_cursor,
         date=date,
     )
 
@@ -168,6 +214,32 @@ def update_sensor(sensor_id):
     )
 
 
+ReadingRow = namedtuple(
+    'ReadingRow',
+    'time int_temp int_temp_f ext_temp ext_temp_f humidity resistance luminosity',
+)
+
+def reading_rows(rows, timezone):
+    times = format_local_times([row[0] for row in rows], timezone, '%H:%M %Z')
+    return [
+        ReadingRow(
+            time=time,
+            int_temp='{:.1f}'.format(int_temp),
+            int_temp_f='{:.1f}'.format(int_temp * 9/5 + 32),
+            ext_temp='{:.1f}'.format(ext_temp),
+            ext_temp_f='{:.1f}'.format(ext_temp * 9/5 + 32),
+            humidity='{:.1f}'.format(humidity) if humidity else None,
+            resistance=numerify(resistance),
+            luminosity=numerify(10**6 / resistance, prec=2) if resistance > 0 else None,
+        )
+        for time, (_, int_temp, ext_temp, humidity, resistance) in zip(times, rows)
+    ]
+
+def dashboard_sensors(criterion):
+    return db.session.query(Sensor).join(Home).filter(criterion) \
+        .options(db.contains_eager(Sensor.home), db.joinedload(Sensor.latest)) \
+        .order_by(Sensor.name).all()
+
 def get_redirect_target():
     for target in request.values.get('next'), request.referrer:
         if not target:
@@ -182,6 +254,11 @@ def redirect_back(default, **params):
         target = url_for(default, **params)
     return redirect(target)
 
+def remote_address():
+    # Heroku's router appends the connecting address to X-Forwarded-For,
+    # so the last entry is the only one a client cannot forge.
+    return request.access_route[-1]
+
 def is_safe_url(url):
     ref_url = urlparse(request.host_url)
     test_url = urlparse(urljoin(request.host_url, url))